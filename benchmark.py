@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+
+'''
+-- makeGrid/zipfCorpus/zipfSentences/randomLexicon/randomWords - synthetic inputs, reproducible from a seed
+-- BENCHMARKS - one setup function per benchmark, returning the call to time and how many items it processes
+-- measure - best wall time over several runs, tracemalloc peak memory and an optional cProfile dump
+-- main - runs the benchmarks at the chosen scales, writes JSON results and compares against an earlier run
+'''
+
+import os
+import sys
+import json
+import time
+import random
+import cProfile
+import platform
+import pstats
+import tracemalloc
+
+from argparse import ArgumentParser
+from collections import Counter
+from dijkstra import dijkstra, dijkstraBidirectional
+from fastXOR import quickXOR
+from textProcessing import calcProbs, ngrams
+from textGen import generateText
+from summariseText import cosineModel, bm25Summarise
+from morphAnalyser import MorphLexicon, buildCoordDict, findSeqs
+
+SCALES = ["small", "medium", "large"]
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def makeGrid(side):
+    # side x side grid, each node joined to its horizontal and vertical neighbours
+    nodes = [(row, col) for row in range(side) for col in range(side)]
+    graph = {}
+
+    for row, col in nodes:
+        graph[(row, col)] = [(r, c) for r, c in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)) if 0 <= r < side and 0 <= c < side]
+
+    return graph, nodes
+
+
+def randomVocab(size, rng, minLen=2, maxLen=8):
+    vocab = {}
+    while len(vocab) < size:
+        vocab["".join(rng.choice(LETTERS) for _ in range(rng.randint(minLen, maxLen)))] = None
+
+    return list(vocab)
+
+
+def zipfCorpus(tokenCount, rng, vocabSize=5000, exponent=1.1):
+    # word frequencies fall off as 1 / rank^exponent, like natural text
+    vocab = randomVocab(vocabSize, rng)
+    weights = [1 / rank ** exponent for rank in range(1, vocabSize + 1)]
+
+    return rng.choices(vocab, weights=weights, k=tokenCount)
+
+
+def zipfSentences(sentenceCount, rng, sentenceLen=20):
+    tokens = zipfCorpus(sentenceCount * sentenceLen, rng)
+
+    return [" ".join(tokens[i:i + sentenceLen]) for i in range(0, len(tokens), sentenceLen)]
+
+
+def randomLexicon(entryCount, rng, alphabet=LETTERS[:8]):
+    # lexDict in the format morphAnalyser reads: prefixes end in "-", suffixes start with "-"
+    # a small alphabet makes affixes overlap inside words, as they do in real lexicons
+    lexDict = {}
+
+    while len(lexDict) < entryCount:
+        roll = rng.random()
+        if roll < 0.15:
+            entry = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 3))) + "-"
+            gloss = f"PRE{len(lexDict)}"
+        elif roll < 0.4:
+            entry = "-" + "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 3)))
+            gloss = f"SUF{len(lexDict)}"
+        else:
+            entry = "".join(rng.choice(alphabet) for _ in range(rng.randint(2, 5)))
+            gloss = f"STEM{len(lexDict)}"
+        lexDict.setdefault(entry, [[gloss, [None]]])
+
+    return lexDict
+
+
+def randomWords(lexDict, wordCount, rng, maxLen=14):
+    # prefix? stem suffix{0,2}, so most words have a real analysis
+    prefixes = [entry[:-1] for entry in lexDict if entry.endswith("-")]
+    suffixes = [entry[1:] for entry in lexDict if entry.startswith("-")]
+    stems = [entry for entry in lexDict if "-" not in entry]
+    words = []
+
+    while len(words) < wordCount:
+        parts = [rng.choice(prefixes)] if prefixes and rng.random() < 0.5 else []
+        parts.append(rng.choice(stems))
+        parts.extend(rng.choice(suffixes) for _ in range(rng.randint(0, 2) if suffixes else 0))
+        word = "".join(parts)
+        if len(word) <= maxLen:
+            words.append(word)
+
+    return words
+
+
+# each setup takes a size and a seeded Random and returns (call to time, items processed per call, unit)
+
+def setupDijkstra(side, rng):
+    graph, nodes = makeGrid(side)
+    return lambda: dijkstra(graph, nodes), len(nodes), "nodes"
+
+
+def setupDijkstraBidirectional(side, rng):
+    graph, nodes = makeGrid(side)
+    return lambda: dijkstraBidirectional(graph, nodes, (side - 1, side - 1)), len(nodes), "nodes"
+
+
+def setupQuickXOR(pairCount, rng):
+    pairs = [(rng.randint(1, 10 ** 6), rng.randint(10 ** 6, 10 ** 9)) for _ in range(pairCount)]
+
+    def run():
+        for n1, n2 in pairs:
+            quickXOR(n1, n2)
+
+    return run, pairCount, "pairs"
+
+
+def setupCalcProbs(tokenCount, rng):
+    ngramFreqs = Counter(ngrams(zipfCorpus(tokenCount, rng), 3))
+    return lambda: calcProbs(ngramFreqs, 3), tokenCount, "tokens"
+
+
+def setupGenerateText(textLen, rng):
+    tokens = zipfCorpus(100000, rng)
+    probs = calcProbs(Counter(ngrams(tokens, 2)), 2)
+    seed = rng.randrange(2 ** 32)
+
+    def run():
+        # generateText draws from the global random module
+        random.seed(seed)
+        return generateText(probs, textLen, "bigram", 2, tokens[0])
+
+    return run, textLen, "words"
+
+
+def setupCosineModel(sentenceCount, rng):
+    sentences = zipfSentences(sentenceCount, rng)
+    return lambda: cosineModel(sentences, None, 3, 10), sentenceCount, "sentences"
+
+
+def setupBm25(sentenceCount, rng):
+    tokens = [sentence.split() for sentence in zipfSentences(sentenceCount, rng)]
+    return lambda: bm25Summarise(tokens), sentenceCount, "sentences"
+
+
+def setupMorphLexicon(entryCount, rng):
+    lexDict = randomLexicon(entryCount, rng)
+    return lambda: MorphLexicon(lexDict), entryCount, "entries"
+
+
+def setupFindSeqs(entryCount, rng, wordCount=300, nBest=10):
+    # buildCoordDict then findSeqs for every morph type, as coordMatch does
+    lexicon = MorphLexicon(randomLexicon(entryCount, rng))
+    words = randomWords(lexicon.glosses, wordCount, rng)
+
+    def run():
+        for word in words:
+            coordDict, stems, wordFound = buildCoordDict(word, lexicon)
+            if wordFound:
+                continue
+            for coordType in ("prefixes", "stems", "suffixes"):
+                findSeqs(word, list(coordDict[coordType]), coordType, nBest)
+
+    return run, wordCount, "words"
+
+
+# sizes for the small, medium and large scales
+BENCHMARKS = {
+    "dijkstra": (setupDijkstra, [10, 20, 40]),
+    "dijkstraBidirectional": (setupDijkstraBidirectional, [10, 20, 40]),
+    "quickXOR": (setupQuickXOR, [10000, 100000, 1000000]),
+    "calcProbs": (setupCalcProbs, [10000, 100000, 1000000]),
+    "generateText": (setupGenerateText, [100, 1000, 10000]),
+    "cosineModel": (setupCosineModel, [50, 200, 800]),
+    "bm25Summarise": (setupBm25, [100, 1000, 10000]),
+    "morphLexicon": (setupMorphLexicon, [100, 1000, 10000]),
+    "findSeqs": (setupFindSeqs, [100, 1000, 10000]),
+}
+
+
+def measure(run, repeat, profilePath=None):
+    # an untimed warm-up run, so lazy imports (scipy, gensim) don't land in the first timing
+    run()
+
+    # timing runs come before and without tracing, tracemalloc slows allocation-heavy code down
+    best = float("inf")
+    for _ in range(repeat):
+        startTime = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - startTime)
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    profiler = None
+    if profilePath:
+        profiler = cProfile.Profile()
+        profiler.runcall(run)
+        profiler.dump_stats(profilePath)
+
+    return best, peak, profiler
+
+
+def loadResults(path):
+    with open(path, "r") as resultsFile:
+        previous = json.load(resultsFile)
+
+    return {(result["benchmark"], result["size"]): result for result in previous["results"]}
+
+
+def main():
+    parser = ArgumentParser(usage=__doc__)
+    parser.add_argument('benchmarks', metavar='benchmarks', help=f'Benchmarks to run, defaults to all of: {", ".join(BENCHMARKS)}', nargs='*', default=list(BENCHMARKS))
+    parser.add_argument('--scales', metavar='scales', help='Input scales to run', nargs='+', default=["small", "medium"], choices=SCALES)
+    parser.add_argument('--repeat', metavar='repeat', help='Timed runs per benchmark, the best is kept', type=int, default=3)
+    parser.add_argument('--seed', metavar='seed', help='Seed for the synthetic data', type=int, default=0)
+    parser.add_argument('--profile', metavar='profile dir', help='Save a cProfile dump per benchmark here and print its hot spots', default=None)
+    parser.add_argument('--hotspots', metavar='hot spots', help='Functions to list from each --profile run', type=int, default=10)
+    parser.add_argument('--out', metavar='results file', help='Write the results as JSON', default=None)
+    parser.add_argument('--compare', metavar='previous results', help='A JSON results file from an earlier run to compare throughput against', default=None)
+    args = parser.parse_args()
+
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        sys.stderr.write(f"ERROR: unknown benchmarks: {', '.join(unknown)}\n")
+        raise Exception("Benchmark not recognised")
+
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+
+    previous = loadResults(args.compare) if args.compare else {}
+    results = []
+
+    sys.stdout.write(f"{'benchmark':22} {'scale':7} {'size':>8} {'seconds':>9} {'throughput':>12} {'':13} {'peak MiB':>9}\n")
+
+    for name in args.benchmarks:
+        setup, sizes = BENCHMARKS[name]
+
+        for scale in args.scales:
+            size = sizes[SCALES.index(scale)]
+            run, items, unit = setup(size, random.Random(args.seed))
+            profilePath = os.path.join(args.profile, f"{name}-{scale}.prof") if args.profile else None
+
+            seconds, peak, profiler = measure(run, args.repeat, profilePath)
+            throughput = items / seconds if seconds else float("inf")
+            results.append({"benchmark": name, "scale": scale, "size": size, "items": items, "unit": unit, "seconds": seconds, "throughput": throughput, "peak_bytes": peak})
+
+            line = f"{name:22} {scale:7} {size:8} {seconds:9.4f} {throughput:12.0f} {unit + '/s':13} {peak / 2 ** 20:9.2f}"
+            if (name, size) in previous:
+                change = throughput / previous[(name, size)]["throughput"] - 1
+                line += f"  {change:+.1%}"
+            sys.stdout.write(line + "\n")
+
+            if profiler is not None:
+                pstats.Stats(profiler, stream=sys.stdout).sort_stats("tottime").print_stats(args.hotspots)
+
+    if args.out:
+        with open(args.out, "w") as resultsFile:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.platform(),
+                "seed": args.seed,
+                "repeat": args.repeat,
+                "results": results,
+            }, resultsFile, indent=2)
+
+
+if __name__ == '__main__':
+    main()
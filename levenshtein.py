@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+'''
+-- myersDistance - bit-parallel Levenshtein distance (Myers/Hyyrö), with an optional cutoff
+-- nearPairs - finds every pair of words within a maximum distance, using a symmetric deletion index for candidates
+-- main - writes the pairs as a TSV for morphAnalyser
+'''
+
+import sys
+
+from argparse import ArgumentParser
+
+
+def myersDistance(a, b, maxDist=None):
+    # returns maxDist + 1 as soon as the distance is known to be larger than maxDist
+    if len(a) < len(b):
+        a, b = b, a
+
+    if maxDist is not None and len(a) - len(b) > maxDist:
+        return maxDist + 1
+
+    # the shorter word is the pattern, one bit per character
+    m = len(b)
+    if m == 0:
+        return len(a)
+
+    peq = {}
+    for i, char in enumerate(b):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv = mask
+    mv = 0
+    score = m
+    remaining = len(a)
+
+    for char in a:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+
+        # row 0 grows by one per text character, so a +1 shifts in at the bottom
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+
+        remaining -= 1
+        # the score moves by at most one per remaining character
+        if maxDist is not None and score - remaining > maxDist:
+            return maxDist + 1
+
+    return score
+
+
+def deletions(word, maxDist):
+    # every string reachable from word by deleting up to maxDist characters
+    found = {word}
+    frontier = {word}
+
+    for _ in range(maxDist):
+        nextFrontier = set()
+        for variant in frontier:
+            for i in range(len(variant)):
+                nextFrontier.add(variant[:i] + variant[i + 1:])
+        nextFrontier -= found
+        found |= nextFrontier
+        frontier = nextFrontier
+
+    return found
+
+
+def nearPairs(words, maxDist):
+    # words within maxDist always share a deletion variant, so only those pairs are compared
+    # yields (earlier word, later word, distance) in input order
+    index = {}
+    seen = set()
+    wordList = []
+
+    for word in words:
+        if word in seen:
+            continue
+        seen.add(word)
+
+        variants = deletions(word, maxDist)
+        candidates = set()
+        for variant in variants:
+            candidates.update(index.get(variant, ()))
+
+        for otherID in sorted(candidates):
+            other = wordList[otherID]
+            dist = myersDistance(other, word, maxDist)
+            if dist <= maxDist:
+                yield other, word, dist
+
+        for variant in variants:
+            index.setdefault(variant, []).append(len(wordList))
+        wordList.append(word)
+
+
+def main():
+    parser = ArgumentParser(usage=__doc__)
+    parser.add_argument('input', help='A text file with one word per line')
+    parser.add_argument('-k', metavar='max distance', help='Only output pairs within this edit distance', default=2, type=int)
+    args = parser.parse_args()
+
+    with open(args.input) as wordFile:
+        words = [line.strip() for line in wordFile if line.strip()]
+
+    sys.stdout.write("word1\tword2\tdistance\n")
+    for w1, w2, dist in nearPairs(words, args.k):
+        sys.stdout.write(f"{w1}\t{w2}\t{dist}\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,83 +3,474 @@
 morphAnalyser
 
 The function of this script is to identify a potential combination of a stem and morphemes in a given word.
-The flow is main -> buildCoordDict -> coordMatch => (findSeqs -> buildPath -> filterSeqs)
+The flow is main -> buildCoordDict -> coordMatch => (findSeqs -> SegmentationLattice -> filterSeqs)
+Word comparison (--compare) is main -> compareWords => (areVariants, morphSignature for --diffs)
 
 TODO:
     Single Morphs:
     - OPTIONAL: Fix greedyMatch to work on morphs that overlap on the last/first char of each morph
     - Fix to work with single items at beginning (for prefixes) and end (for suffixes) of word
     - Work on extracting data straight from lexDict instead of building morphDict
-    - Implement filterSeqs to cut down on redundant morph splitter info
-    - Implement filterSeqs to create likely sequences of morphs and stems
-    
-    Word Comparison:
-    - Implement variant checker
-    - Find common differences
 """
 
+import os
 import sys
 import json
+import pickle
+import heapq
+import hashlib
 
 from argparse import ArgumentParser
 from csv import reader
-from itertools import combinations, chain
-from collections import Counter
+from itertools import combinations
+from collections import Counter, OrderedDict, deque
+from multiprocessing import Pool, get_context, get_all_start_methods
+from levenshtein import nearPairs
+
+PREFIX = 1
+SUFFIX = 2
+STEM = 4
+
+TYPE_CODES = {"prefixes": PREFIX, "stems": STEM, "suffixes": SUFFIX}
+TYPE_NAMES = {code: coordType for coordType, code in TYPE_CODES.items()}
+
+# bump when the cached analysis objects change shape
+ANALYSIS_CACHE_VERSION = 5
+# bump when the saved lexicon state changes shape
+LEXICON_VERSION = 1
+
+
+class AffixAutomaton:
+    """
+    Aho-Corasick automaton over every prefix and suffix in the lexicon.
+    Built once, then findAll reports every affix occurrence in a word in a single pass.
+    """
+
+    def __init__(self, prefixes, suffixes):
+        self.goto = [{}]
+        self.fail = [0]
+        self.mask = [0]
+        self.depth = [0]
+
+        # lexicon affixes carry their hyphen ("-ing", "re-"), match on the bare form
+        for suffix in suffixes:
+            if len(suffix) > 1 and suffix[0] == "-":
+                self.addPattern(suffix[1:], SUFFIX)
+
+        for prefix in prefixes:
+            if len(prefix) > 1 and prefix[-1] == "-":
+                self.addPattern(prefix[:-1], PREFIX)
+
+        self.buildLinks()
+
+    def addPattern(self, pattern, affixType):
+        state = 0
+
+        for char in pattern:
+            nextState = self.goto[state].get(char)
+            if nextState is None:
+                nextState = len(self.goto)
+                self.goto[state][char] = nextState
+                self.goto.append({})
+                self.fail.append(0)
+                self.mask.append(0)
+                self.depth.append(self.depth[state] + 1)
+            state = nextState
+
+        self.mask[state] |= affixType
+
+    def buildLinks(self):
+        # output of each state is its own match plus every match reachable by fail links
+        self.out = [[] for _ in self.goto]
+        queue = deque()
+
+        for state in self.goto[0].values():
+            queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            if self.mask[state]:
+                self.out[state].append((self.depth[state], self.mask[state]))
+            self.out[state].extend(self.out[self.fail[state]])
+
+            for char, nextState in self.goto[state].items():
+                failState = self.fail[state]
+                while failState and char not in self.goto[failState]:
+                    failState = self.fail[failState]
+                self.fail[nextState] = self.goto[failState].get(char, 0)
+                queue.append(nextState)
+
+    def findAll(self, word):
+        # yields (start, end, affixType mask) for every affix occurrence
+        state = 0
+
+        for end, char in enumerate(word, 1):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+
+            for length, affixType in self.out[state]:
+                yield end - length, end, affixType
+
+    def toState(self):
+        return {"goto": self.goto, "fail": self.fail, "mask": self.mask, "depth": self.depth, "out": self.out}
+
+    @staticmethod
+    def fromState(state):
+        automaton = AffixAutomaton.__new__(AffixAutomaton)
+        automaton.goto = state["goto"]
+        automaton.fail = state["fail"]
+        automaton.mask = state["mask"]
+        automaton.depth = state["depth"]
+        automaton.out = state["out"]
+
+        return automaton
+
+
+class MorphLexicon:
+    """
+    Compiled form of the lexicon: hashed sets for membership, a variant -> group index,
+    glosses and the affix automaton. Can be saved so startup skips the JSON lexicon; the file
+    holds only plain containers, so it loads whether the saver ran as a script or a library.
+    """
+
+    def __init__(self, lexDict):
+        morphDict = createMorphDict(lexDict)
+
+        self.stems = set(morphDict["stems"])
+        self.suffixes = set(morphDict["suffixes"])
+        self.prefixes = set(morphDict["prefixes"])
+        self.hasVariants = set(morphDict["has_variants"])
+        self.variants = morphDict["variants"]
+        self.automaton = morphDict["automaton"]
+        self.glosses = {entry: values[0][0] for entry, values in lexDict.items()}
+        # identifies this lexicon version, so on-disk analysis caches can be invalidated
+        self.fingerprint = hashlib.sha1(json.dumps(lexDict, sort_keys=True).encode("utf-8")).hexdigest()
+
+        # first group containing each form
+        self.variantIndex = {}
+        for groupID, group in enumerate(self.variants):
+            for variant in group:
+                self.variantIndex.setdefault(variant, groupID)
+        self.variantSets = [frozenset(group) for group in self.variants]
+
+    def findVariants(self, word, coordType=""):
+        if coordType == "suffixes" and word[0] != "-":
+            word = "-" + word
+        elif coordType == "prefixes" and word[-1] != "-":
+            word = word + "-"
+
+        groupID = self.variantIndex.get(word)
+        if groupID is None:
+            return []
+
+        return self.variants[groupID]
+
+    def areVariants(self, w1, w2):
+        # each word must appear in the other's variant group
+        if w1 not in self.hasVariants or w2 not in self.hasVariants:
+            return False
+
+        w1Group = self.variantIndex.get(w1)
+        w2Group = self.variantIndex.get(w2)
+        if w1Group is None or w2Group is None:
+            return False
+
+        return w1 in self.variantSets[w2Group] and w2 in self.variantSets[w1Group]
+
+    def save(self, path):
+        state = {
+            "version": LEXICON_VERSION,
+            "stems": self.stems,
+            "suffixes": self.suffixes,
+            "prefixes": self.prefixes,
+            "hasVariants": self.hasVariants,
+            "variants": self.variants,
+            "variantIndex": self.variantIndex,
+            "glosses": self.glosses,
+            "fingerprint": self.fingerprint,
+            "automaton": self.automaton.toState(),
+        }
+
+        with open(path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            try:
+                state = pickle.load(f)
+            except (pickle.UnpicklingError, AttributeError, ImportError):
+                state = None
+
+        if not isinstance(state, dict) or state.get("version") != LEXICON_VERSION:
+            sys.stderr.write(f"ERROR: {path} was saved by an older version; rebuild it with --save-lexicon.\n")
+            raise Exception("Outdated lexicon file")
+
+        lexicon = MorphLexicon.__new__(MorphLexicon)
+        lexicon.stems = state["stems"]
+        lexicon.suffixes = state["suffixes"]
+        lexicon.prefixes = state["prefixes"]
+        lexicon.hasVariants = state["hasVariants"]
+        lexicon.variants = state["variants"]
+        lexicon.variantIndex = state["variantIndex"]
+        lexicon.glosses = state["glosses"]
+        lexicon.fingerprint = state["fingerprint"]
+        lexicon.automaton = AffixAutomaton.fromState(state["automaton"])
+        lexicon.variantSets = [frozenset(group) for group in lexicon.variants]
+
+        return lexicon
+
+
+class AnalysisCache:
+    """
+    LRU cache for whole-word analyses, with hit/miss counts for sizing. Can be saved to disk;
+    a saved cache is discarded when loaded against a different lexicon.
+    Substrings are not cached separately: the affix automaton classifies them in one pass
+    and resolveMorph is a dict lookup, so a table in front of either costs more than it saves.
+    """
+
+    def __init__(self, maxWords=100000, lexiconKey=None):
+        self.maxWords = maxWords
+        self.lexiconKey = lexiconKey
+        self.words = OrderedDict()
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def getWord(self, key):
+        value = self.words.get(key)
+
+        if value is None:
+            self.misses["words"] += 1
+        else:
+            self.words.move_to_end(key)
+            self.hits["words"] += 1
 
+        return value
 
-def findVariants(word, variantGroups, coordType):
-    variantsFound = []
+    def putWord(self, key, value):
+        self.words[key] = value
+        self.words.move_to_end(key)
 
-    if coordType == "suffixes" and word[0] != "-":
-        word = "-" + word
-    elif coordType == "prefixes" and word[-1] != "-":
-        word = word + "-"
+        if len(self.words) > self.maxWords:
+            self.words.popitem(last=False)
 
-    for i, varList in enumerate(variantGroups):
-        if word in varList:
-            variantsFound.append(variantGroups[i])
+    def stats(self):
+        lookups = self.hits["words"] + self.misses["words"]
 
-    if len(variantsFound) and type(variantsFound[0]) == list:
-        return variantsFound[0]
-    else:
-        return variantsFound
+        return {"words": {
+            "size": len(self.words),
+            "hits": self.hits["words"],
+            "misses": self.misses["words"],
+            "hitRate": self.hits["words"] / lookups if lookups else 0.0,
+        }}
+
+    def takeCounts(self):
+        # hit/miss counts since the last call, for workers to report back to the parent
+        counts = (self.hits, self.misses)
+        self.hits = Counter()
+        self.misses = Counter()
+
+        return counts
+
+    def addCounts(self, counts):
+        hits, misses = counts
+        self.hits.update(hits)
+        self.misses.update(misses)
+
+    def save(self, path):
+        # analyses are stored as plain tuples, so the file loads whether it was saved from the CLI or the library
+        words = [(key, analysis.toState()) for key, analysis in self.words.items()]
+
+        with open(path, "wb") as f:
+            pickle.dump({"version": ANALYSIS_CACHE_VERSION, "lexicon": self.lexiconKey, "words": words}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path, lexiconKey, maxWords=100000):
+        cache = AnalysisCache(maxWords, lexiconKey)
+
+        if not os.path.exists(path):
+            return cache
+
+        with open(path, "rb") as f:
+            try:
+                saved = pickle.load(f)
+            except (pickle.UnpicklingError, AttributeError, ImportError, EOFError):
+                saved = None
+
+        if not isinstance(saved, dict) or saved.get("version") != ANALYSIS_CACHE_VERSION:
+            sys.stderr.write("WARNING: Analysis cache is from an older format, starting a new one.\n")
+            return cache
 
+        if saved["lexicon"] != lexiconKey:
+            sys.stderr.write("WARNING: Analysis cache was built with a different lexicon, starting a new one.\n")
+            return cache
 
-def compareWords(wordComparisons, morphDict):
-    variantList = morphDict["has_variants"]
-    variantGroups = morphDict["variants"]
-    coordType = ""
+        for key, state in saved["words"]:
+            cache.putWord(key, WordAnalysis.fromState(state))
+
+        return cache
+
+
+def morphSignature(word, lexicon, pathFilter, cache=None):
+    # affix morphs of the best whole-word analysis, stems left out, so every word is treated the same:
+    # a word that is itself a stem has none, "kats" has PL, "rekat" has AGAIN
+    analysis = analyseWord(word, lexicon, 1, cache, pathFilter)
+    signature = Counter()
+
+    if analysis.inLexicon or not analysis.paths["combined"]:
+        return signature
+
+    path = analysis.paths["combined"][0]
+    for segment, segType in zip(path.segments, path.segmentTypes):
+        if segType != "stems":
+            morph, inLexicon = resolveMorph(lexiconForm(segment, segType), segType, lexicon)
+            if morph and morph != "∅":
+                signature[morph] += 1
+
+    return signature
+
+
+def compareWords(wordComparisons, lexicon, cache=None, topDiffs=0, out=sys.stdout):
+    # wordComparisons can be a stream; per-word decompositions are reused through the cache
+    diffCounter = Counter()
+    signatures = {}
+    signatureFilter = FilterPipeline(("ordering", "stem-required", "single-stem"))
+    buffer = []
 
     for w1, w2, dist in wordComparisons:
-        w1HasVar = False
-        w2HasVar = False
+        if lexicon.areVariants(w1, w2):
+            buffer.append(f"{w1} and {w2} are variants\n")
+
+        buffer.append(f"{w1} -> {w2} {dist}\n")
+
+        if topDiffs:
+            for w in (w1, w2):
+                if w not in signatures:
+                    signatures[w] = morphSignature(w, lexicon, signatureFilter, cache)
+            w1Sig = signatures[w1]
+            w2Sig = signatures[w2]
+            removed = tuple(sorted((w1Sig - w2Sig).elements()))
+            added = tuple(sorted((w2Sig - w1Sig).elements()))
+            if removed or added:
+                diffCounter[(removed, added)] += 1
+
+        if len(buffer) >= 4096:
+            out.write("".join(buffer))
+            buffer = []
 
-        if w1 in variantList:
-            w1Vars = findVariants(w1, variantGroups, coordType)
-            w1HasVar = True
+    out.write("".join(buffer))
 
-        if w2 in variantList:
-            w2Vars = findVariants(w2, variantGroups, coordType)
-            w2HasVar = True
+    if topDiffs:
+        out.write(f"\nTop {topDiffs} common differences:\n")
+        for (removed, added), count in diffCounter.most_common(topDiffs):
+            out.write(f"{'+'.join(removed) or '∅'} -> {'+'.join(added) or '∅'} : {count}\n")
 
-        if w1HasVar and w2HasVar:
-            if w1 in w2Vars and w2 in w1Vars:
-                print(f"{w1} and {w2} are variants")
+    return diffCounter
 
-        print(f"{w1} -> {w2} {dist}")
 
-    return None
+class OrderingRule:
+    # prefix cannot appear after stem or suffix, suffix cannot appear before prefix or stem
+    initial = 0
+    rank = {PREFIX: 0, STEM: 1, SUFFIX: 2}
 
+    def step(self, state, typeCode):
+        typeRank = self.rank[typeCode]
+        return typeRank if typeRank >= state else None
 
-def filterSeqs(pathList, coordType, possibleStems, coordDict):
-    # use variants
-    #paths need to be filtered by:
-    # suffix cannot appear before prefix or stem / prefix cannot appear after stem or suffix
+    def accept(self, state):
+        return True
+
+
+class StemRequiredRule:
     # must have a stem
+    initial = False
+
+    def step(self, state, typeCode):
+        return state or typeCode == STEM
+
+    def accept(self, state):
+        return state
+
+
+class SingleStemRule:
+    # at most one stem segment, so a stem is not split into arbitrary pieces
+    initial = 0
+
+    def step(self, state, typeCode):
+        if typeCode == STEM:
+            state += 1
+        return state if state <= 1 else None
+
+    def accept(self, state):
+        return True
+
+
+# language-specific rules are added here and selected by name with --filters
+FILTER_RULES = {
+    "ordering": OrderingRule,
+    "stem-required": StemRequiredRule,
+    "single-stem": SingleStemRule,
+}
+
+
+class FilterPipeline:
+    """
+    Runs a set of rules as one automaton over integer segment types (PREFIX, STEM, SUFFIX).
+    step returns None as soon as a partial path breaks a rule, so the lattice can prune it.
+    Transitions of the combined automaton are memoised, so each is worked out only once.
+    """
+
+    def __init__(self, names):
+        for name in names:
+            if name not in FILTER_RULES:
+                sys.stderr.write(f"ERROR: Unknown filter {name}, expected one of {', '.join(FILTER_RULES)}\n")
+                raise Exception("Filter not recognised")
+
+        self.names = tuple(names)
+        self.rules = [FILTER_RULES[name]() for name in names]
+        self.transitions = {}
+        self.accepting = {}
+
+    def initial(self):
+        return tuple(rule.initial for rule in self.rules)
+
+    def step(self, state, typeCode):
+        key = (state, typeCode)
+
+        if key not in self.transitions:
+            nextState = []
+            for rule, ruleState in zip(self.rules, state):
+                ruleState = rule.step(ruleState, typeCode)
+                if ruleState is None:
+                    nextState = None
+                    break
+                nextState.append(ruleState)
+            self.transitions[key] = tuple(nextState) if nextState is not None else None
+
+        return self.transitions[key]
+
+    def accept(self, state):
+        if state not in self.accepting:
+            self.accepting[state] = all(rule.accept(ruleState) for rule, ruleState in zip(self.rules, state))
+
+        return self.accepting[state]
+
+    def accepts(self, typeCodes):
+        state = self.initial()
+
+        for typeCode in typeCodes:
+            state = self.step(state, typeCode)
+            if state is None:
+                return False
 
-    print(coordType, pathList)
+        return self.accept(state)
 
-    return []
+
+def filterSeqs(pathList, pathFilter):
+    # filters already built paths of typed coordinates (start, end, typeCode);
+    # SegmentationLattice.segmentations applies the same filter while generating instead
+    return [path for path in pathList if pathFilter.accepts(coord[2] for coord in path)]
 
 
 def findStem(word, coordDict, stems):
@@ -105,36 +496,144 @@ def findStem(word, coordDict, stems):
     return stemFound, stemMatches
 
 
-def buildPath(pathList, pathDict):
-    newPathList = []
-    count = 0
-    countStop = len(pathList)
-    stopSignal = False
+class SegmentationLattice:
+    """
+    DAG over the coordinates of a word: coord_i -> coord_j whenever coord_i ends where coord_j starts.
+    Paths run from any coordinate with a successor until a coordinate with none, and can be
+    enumerated, counted or ranked by dynamic programming without copying partial paths.
+    """
 
-    for path in pathList:
-        endPoint = path[-1]
-        if endPoint in pathDict.keys():
-            for newEndPoint in pathDict[endPoint]:
-                newPath = path.copy()
-                newPath.append(newEndPoint)
-                newPathList.append(newPath)
-        else:
-            newPathList.append(path)
-            count += 1
-    
-    # will loop until all paths exhausted
-    if count == countStop:
-        stopSignal = True
+    def __init__(self, coords):
+        self.coords = coords
+        self.byStart = {}
+
+        for coord in coords:
+            self.byStart.setdefault(coord[0], []).append(coord)
+
+    def successors(self, coord):
+        return self.byStart.get(coord[1], [])
+
+    def sources(self):
+        return [coord for coord in self.coords if self.successors(coord)]
+
+    def paths(self):
+        # depth-first, successors in coordinate order, so paths come out in the same order buildPath gave
+        for source in self.sources():
+            stack = [(source, iter(self.successors(source)))]
+            path = [source]
+
+            while stack:
+                node, children = stack[-1]
+                child = next(children, None)
+
+                if child is None:
+                    stack.pop()
+                    path.pop()
+                    continue
+
+                path.append(child)
+                childSuccessors = self.successors(child)
+                if childSuccessors:
+                    stack.append((child, iter(childSuccessors)))
+                else:
+                    yield path.copy()
+                    path.pop()
+
+    def segmentations(self, wordLen, pathFilter=None):
+        # full analyses over typed coordinates (start, end, typeCode), chained from 0 to wordLen
+        # pathFilter is checked on every step, so a broken branch is dropped before it is extended
+        stack = [(iter(self.byStart.get(0, [])), pathFilter.initial() if pathFilter else None)]
+        path = []
+
+        while stack:
+            children, state = stack[-1]
+            child = next(children, None)
+
+            if child is None:
+                stack.pop()
+                if path:
+                    path.pop()
+                continue
+
+            childState = state
+            if pathFilter is not None:
+                childState = pathFilter.step(state, child[2])
+                if childState is None:
+                    continue
+
+            if child[1] == wordLen:
+                if pathFilter is None or pathFilter.accept(childState):
+                    yield path + [child]
+                continue
+
+            path.append(child)
+            stack.append((iter(self.byStart.get(child[1], [])), childState))
+
+    def countPaths(self):
+        counts = {}
+
+        # successors always start later, so going by descending start visits them first
+        for coord in sorted(self.coords, reverse=True):
+            nextCoords = self.successors(coord)
+            counts[coord] = sum(counts[c] for c in nextCoords) if nextCoords else 1
+
+        return sum(counts[c] for source in self.sources() for c in self.successors(source))
+
+    def nBest(self, n, segmentCost=None):
+        # keeps the n cheapest completions per coordinate; default cost prefers fewer, longer segments
+        if segmentCost is None:
+            segmentCost = lambda coord: 1
+        best = {}
+
+        for coord in sorted(self.coords, reverse=True):
+            cost = segmentCost(coord)
+            nextCoords = self.successors(coord)
+
+            if nextCoords:
+                candidates = ((cost + tailCost, (coord,) + tail) for c in nextCoords for tailCost, tail in best[c])
+                best[coord] = heapq.nsmallest(n, candidates)
+            else:
+                best[coord] = [(cost, (coord,))]
+
+        candidates = ((segmentCost(source) + tailCost, (source,) + tail) for source in self.sources() for c in self.successors(source) for tailCost, tail in best[c])
+
+        return [list(path) for cost, path in heapq.nsmallest(n, candidates)]
+
+    def nBestSegmentations(self, wordLen, n, pathFilter=None, segmentCost=None):
+        # the n cheapest full analyses from 0 to wordLen; like nBest, but the n cheapest completions
+        # are kept per (start, filter state), so filtered paths are ranked without enumerating them all
+        if segmentCost is None:
+            segmentCost = lambda coord: 1
+        best = {}
+
+        def completions(start, state):
+            key = (start, state)
+
+            if key not in best:
+                candidates = []
+                for coord in self.byStart.get(start, []):
+                    nextState = state
+                    if pathFilter is not None:
+                        nextState = pathFilter.step(state, coord[2])
+                        if nextState is None:
+                            continue
+
+                    cost = segmentCost(coord)
+                    if coord[1] == wordLen:
+                        if pathFilter is None or pathFilter.accept(nextState):
+                            candidates.append((cost, (coord,)))
+                    else:
+                        candidates.extend((cost + tailCost, (coord,) + tail) for tailCost, tail in completions(coord[1], nextState))
+                best[key] = heapq.nsmallest(n, candidates)
 
-    return newPathList, stopSignal
+            return best[key]
 
+        return [list(path) for cost, path in completions(0, pathFilter.initial() if pathFilter is not None else None)]
 
-def findSeqs(word, coords, coordType):
+
+def findSeqs(word, coords, coordType, nBest=None):
     #coords is a list of the indices for prefixes, stems, or suffixes
     filteredCoords = []
-    pathDict = {}
-    pathList = []
-    stopSignal = False
 
     # prefilter coordinates depending on type:
     # suffixes cannot start at 0, prefixes cannot end at word length
@@ -155,168 +654,396 @@ def findSeqs(word, coords, coordType):
     # if filteredCoords is empty, then no possible matches
     if not filteredCoords:
         return []
-    
-    # create pathDict to loop over
-    for coord_i in coords:
-        for coord_j in coords:
-            if coord_i[1] == coord_j[0]:
-                if coord_i not in pathDict.keys():
-                    pathDict[coord_i] = [coord_j]
-                else:
-                    pathDict[coord_i].append(coord_j)
-
-    # loop over pathDict to get first pathList
-    for key, values in pathDict.items():
-        if len(values) > 1:
-            #multiple branches
-            for value in values:
-                pathList.append([key, value])
+
+    lattice = SegmentationLattice(coords)
+
+    if nBest:
+        return lattice.nBest(nBest)
+
+    return list(lattice.paths())
+
+
+def resolveMorph(char, coordType, lexicon):
+    # gloss for a hyphenated segment, or its variants' glosses joined by "/", or ∅
+    # second value is True only for a direct lexicon gloss
+    glosses = lexicon.glosses
+    morph = glosses.get(char)
+
+    if morph is not None:
+        return morph, True
+
+    if char in lexicon.hasVariants:
+        variantsFound = lexicon.findVariants(char, coordType)
+        if variantsFound:
+            morphVariantList = [glosses[variant] for variant in variantsFound if variant in glosses]
+            return "/".join(filter(None, morphVariantList)), False
+        return None, False
+
+    return "∅", False
+
+
+class PathAnalysis:
+    """
+    One segmentation of a word: the substrings, their coordinate type, and their morphs
+    (glosses, "/"-joined variant glosses, or ∅). lexMorphs are the direct lexicon glosses.
+    """
+
+    __slots__ = ("coordType", "segments", "morphs", "lexMorphs", "segmentTypes")
+
+    def __init__(self, coordType, segments, morphs, lexMorphs, segmentTypes=None):
+        self.coordType = coordType
+        self.segments = segments
+        self.morphs = morphs
+        self.lexMorphs = lexMorphs
+        # only set for combined analyses, where each segment has its own type
+        self.segmentTypes = segmentTypes
+
+    def toDict(self):
+        out = {"segments": list(self.segments), "morphs": list(self.morphs)}
+        if self.segmentTypes is not None:
+            out["types"] = list(self.segmentTypes)
+
+        return out
+
+    def toState(self):
+        return self.coordType, self.segments, self.morphs, self.lexMorphs, self.segmentTypes
+
+    @staticmethod
+    def fromState(state):
+        return PathAnalysis(*state)
+
+
+class WordAnalysis:
+    """
+    All analyses of a word, or its gloss if the word is itself in the lexicon.
+    """
+
+    __slots__ = ("word", "inLexicon", "gloss", "stemMatches", "paths")
+
+    def __init__(self, word, inLexicon=False, gloss=None, stemMatches=(), paths=None):
+        self.word = word
+        self.inLexicon = inLexicon
+        self.gloss = gloss
+        self.stemMatches = stemMatches
+        self.paths = paths if paths is not None else {}
+
+    def morphCounts(self, coordType=None):
+        counter = Counter()
+
+        for pathType, pathList in self.paths.items():
+            if coordType is None or pathType == coordType:
+                for path in pathList:
+                    counter.update(path.lexMorphs)
+
+        return counter
+
+    def toDict(self):
+        if self.inLexicon:
+            return {"word": self.word, "inLexicon": True, "gloss": self.gloss}
+
+        analyses = {coordType: [path.toDict() for path in pathList] for coordType, pathList in self.paths.items()}
+
+        return {"word": self.word, "inLexicon": False, "analyses": analyses, "morphCounts": dict(self.morphCounts())}
+
+    def toState(self):
+        paths = {coordType: [path.toState() for path in pathList] for coordType, pathList in self.paths.items()}
+
+        return self.word, self.inLexicon, self.gloss, tuple(self.stemMatches), paths
+
+    @staticmethod
+    def fromState(state):
+        word, inLexicon, gloss, stemMatches, paths = state
+        paths = {coordType: [PathAnalysis.fromState(path) for path in pathList] for coordType, pathList in paths.items()}
+
+        return WordAnalysis(word, inLexicon, gloss, stemMatches, paths)
+
+
+class AnalysisWriter:
+    """
+    Formats WordAnalysis objects as text (the classic report) or JSON lines,
+    buffering output and writing it in large blocks.
+    """
+
+    def __init__(self, out=sys.stdout, outFormat="text", bufferSize=1 << 16):
+        self.out = out
+        self.outFormat = outFormat
+        self.bufferSize = bufferSize
+        self.buffer = []
+        self.bufferLen = 0
+
+    def write(self, analysis):
+        if self.outFormat == "json":
+            text = json.dumps(analysis.toDict(), ensure_ascii=False) + "\n"
         else:
-            pathList.append([key, values[0]])
-    
-    while stopSignal == False:
-        pathList, stopSignal = buildPath(pathList, pathDict)
+            text = formatAnalysis(analysis)
+
+        self.buffer.append(text)
+        self.bufferLen += len(text)
+
+        if self.bufferLen >= self.bufferSize:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.out.write("".join(self.buffer))
+            self.buffer = []
+            self.bufferLen = 0
+
+
+def formatAnalysis(analysis):
+    word = analysis.word
+
+    if analysis.inLexicon:
+        return f"{word} : {analysis.gloss}\n\n"
+
+    lines = [f"Word is {word}, length: {len(word)}\n"]
+    if analysis.stemMatches:
+        lines.append("Possible stem(s):")
+        for stem, gloss in analysis.stemMatches:
+            lines.append(f"{stem} : {gloss}\n")
+
+    for coordType, pathList in analysis.paths.items():
+        lines.append(f"Possible {coordType}:\n")
+        for path in pathList:
+            lines.append(f"{'-'.join(path.segments)} : {'-'.join(path.morphs)}\n")
+        lines.append("\n")
+
+    # the report has always counted the suffix analyses only
+    morphCounter = analysis.morphCounts("suffixes")
+    lines.append(f"{morphCounter}, Total morphs: {sum(morphCounter.values())} \n\n")
+
+    return "".join(lines)
+
+
+def lexiconForm(char, coordType):
+    # lexicon entries mark suffixes with a leading hyphen and prefixes with a trailing one
+    if coordType == "suffixes":
+        return "-" + char
+    if coordType == "prefixes":
+        return char + "-"
+
+    return char
 
-    return pathList
 
+def coverageCost(word, lexicon):
+    # segment cost for ranking whole-word analyses: characters left to unknown segments dominate,
+    # then the number of segments, so "re-kat" beats both "rekat" and "r-e-k-a-t"
+    uncoveredWeight = len(word) + 1
 
-def coordMatch(word, coordDict, stems, lexDict, morphDict):
-    sequences = []
+    def segmentCost(coord):
+        segType = TYPE_NAMES[coord[2]]
+        morph, inLexicon = resolveMorph(lexiconForm(word[coord[0]:coord[1]], segType), segType, lexicon)
+        if morph and morph != "∅":
+            return 1
+
+        return 1 + uncoveredWeight * (coord[1] - coord[0])
+
+    return segmentCost
+
+
+def segmentPath(word, path, coordType, lexicon):
+    # resolves each coordinate of a path to its morph; typed coordinates carry their own type
     charList = []
     morphList = []
+    lexMorphs = []
+    segmentTypes = [] if coordType == "combined" else None
+
+    for coord in path:
+        segType = TYPE_NAMES[coord[2]] if segmentTypes is not None else coordType
+        char = word[coord[0]:coord[1]]
+        charList.append(char)
+        if segmentTypes is not None:
+            segmentTypes.append(segType)
+        morph, inLexicon = resolveMorph(lexiconForm(char, segType), segType, lexicon)
+        # get rid of possible Nones and empty variant glosses
+        if morph:
+            morphList.append(morph)
+            if inLexicon:
+                lexMorphs.append(morph)
+
+    return PathAnalysis(coordType, tuple(charList), tuple(morphList), tuple(lexMorphs), tuple(segmentTypes) if segmentTypes is not None else None)
+
+
+def coordMatch(word, coordDict, stems, lexicon, nBest=None, pathFilter=None):
     preCoords = ("prefixes", list(coordDict["prefixes"].keys()))
     stemCoords = ("stems", list(coordDict["stems"].keys()))
     sufCoords = ("suffixes", list(coordDict["suffixes"].keys()))
-    morphAnalysis = {}
-    variantList = morphDict["has_variants"]
-    variantGroups = morphDict["variants"]
+    paths = {}
 
     morphTuple = (preCoords, stemCoords, sufCoords)
     stemFound, stemMatches = findStem(word, coordDict, stems)
 
-    sys.stdout.write(f"Word is {word}, length: {len(word)}\n")
     if stemFound:
-        sys.stdout.write(f"Possible stem(s):")
-        for stem in stemMatches:
-            sys.stdout.write(f"{stem} : {lexDict[stem][0][0]}\n")
-    for morph in morphTuple:
-        coordType, coords = morph
-        pathList = findSeqs(word, coords, coordType)
-        morphCounter = Counter()
-        itemCount = 0
-
-        # sequence filtering
-        # sequences = filterSeqs(pathList, coordType, possibleStems, coordDict)
-
-        sys.stdout.write(f"Possible {coordType}:\n")
+        stemMatches = [(stem, lexicon.glosses[stem]) for stem in stemMatches]
+    else:
+        stemMatches = ()
+
+    for coordType, coords in morphTuple:
+        pathList = findSeqs(word, coords, coordType, nBest)
+        paths[coordType] = []
+
         for path in pathList:
-            charList = []
-            morphList = []
-            for coord in path:
-                char = coordDict[coordType][coord]
-                charList.append(char)
-                if coordType == "suffixes":
-                    char = "-" + char
-                elif coordType == "prefixes":
-                    char = char + "-"
-                if char in lexDict.keys():
-                    morph = lexDict[char][0][0]
-                    if morph != None:
-                        morphList.append(morph)
-                        morphCounter[morph] += 1
-                        itemCount += 1
-                    else:
-                        if char in variantList:
-                            variantsFound = findVariants(char, variantGroups, coordType)
-                            if variantsFound:
-                                morphVariantList = []
-                                for variant in variantsFound:
-                                    if variant in lexDict.keys():
-                                        morphVariantList.append(lexDict[variant][0][0])
-                                morphVariantList =  filter(None, morphVariantList)
-                                variants = "/".join(morphVariantList)
-                                morphList.append(variants)
-                        else:
-                            morphList.append("∅")
-                else:
-                    if char in variantList:
-                        variantsFound = findVariants(char, variantGroups, coordType)
-                        if variantsFound:
-                            morphVariantList = []
-                            for variant in variantsFound:
-                                if variant in lexDict.keys():
-                                    morphVariantList.append(lexDict[variant][0][0])
-
-                            morphVariantList =  filter(None, morphVariantList)
-                            variants = "/".join(morphVariantList)
-                            morphList.append(variants)
-                    else:
-                        morphList.append("∅")
-            charOut = "-".join(charList)
-            # get rid of possible Nones
-            morphList = list(filter(None, morphList))
-            morphOut = "-".join(morphList)
-            sys.stdout.write(f"{charOut} : ")
-            sys.stdout.write(f"{morphOut}\n")
-        sys.stdout.write("\n")
-    sys.stdout.write(f"{morphCounter}, Total morphs: {itemCount} \n\n")
-    return None
-
-
-def buildCoordDict(word, morphDict):
+            paths[coordType].append(segmentPath(word, path, coordType, lexicon))
+
+    if pathFilter is not None:
+        # whole-word analyses mixing types, pruned by the filters while the lattice is walked
+        typedCoords = sorted((i, j, TYPE_CODES[coordType]) for coordType, coords in morphTuple for i, j in coords)
+        lattice = SegmentationLattice(typedCoords)
+        if nBest:
+            pathList = lattice.nBestSegmentations(len(word), nBest, pathFilter, coverageCost(word, lexicon))
+        else:
+            pathList = lattice.segmentations(len(word), pathFilter)
+        paths["combined"] = [segmentPath(word, path, "combined", lexicon) for path in pathList]
+
+    return WordAnalysis(word, stemMatches=stemMatches, paths=paths)
+
+
+def analysisKey(word, nBest=None, pathFilter=None):
+    return word, nBest, pathFilter.names if pathFilter is not None else None
+
+
+def analyseWord(word, lexicon, nBest=None, cache=None, pathFilter=None):
+    # returns a WordAnalysis, from the cache when possible
+    if cache is None:
+        return buildAnalysis(word, lexicon, nBest, pathFilter)
+
+    key = analysisKey(word, nBest, pathFilter)
+    analysis = cache.getWord(key)
+    if analysis is None:
+        analysis = buildAnalysis(word, lexicon, nBest, pathFilter)
+        cache.putWord(key, analysis)
+
+    return analysis
+
+
+def buildAnalysis(word, lexicon, nBest=None, pathFilter=None):
+    # builds coordDict, which is the indicies of every identifable prefix and suffix and possible stem in a word
+    coordDict, stems, wordFound = buildCoordDict(word, lexicon)
+
+    # check to see if buildCoordDict found that word is already in the dictionary
+    if wordFound:
+        gloss = lexicon.glosses[word] if word in lexicon.glosses else "variant"
+        return WordAnalysis(word, inLexicon=True, gloss=gloss)
+
+    return coordMatch(word, coordDict, stems, lexicon, nBest, pathFilter)
+
+
+# set in the parent before the pool forks, so workers share the lexicon pages instead of unpickling copies
+workerLexicon = None
+workerCache = None
+
+
+def initWorker(lexicon, cache=None):
+    global workerLexicon, workerCache
+
+    workerLexicon = lexicon
+    workerCache = cache
+
+
+def analyseChunk(job):
+    # each worker reads its inherited copy of the cache; new word analyses go back to the parent
+    words, nBest, pathFilter = job
+    lines = []
+    fresh = []
+    counts = None
+
+    for word in words:
+        if workerCache is None:
+            record = analyseWord(word, workerLexicon, nBest, None, pathFilter)
+        else:
+            key = analysisKey(word, nBest, pathFilter)
+            record = workerCache.getWord(key)
+            if record is None:
+                record = buildAnalysis(word, workerLexicon, nBest, pathFilter)
+                workerCache.putWord(key, record)
+                fresh.append((key, record))
+        lines.append(json.dumps(record.toDict(), ensure_ascii=False))
+
+    if workerCache is not None:
+        counts = workerCache.takeCounts()
+
+    return "\n".join(lines) + "\n", fresh, counts
+
+
+def batchAnalyse(wordList, lexicon, workers=None, chunkSize=500, nBest=None, out=sys.stdout, cache=None, pathFilter=None):
+    global workerLexicon, workerCache
+
+    jobs = ((wordList[i:i + chunkSize], nBest, pathFilter) for i in range(0, len(wordList), chunkSize))
+
+    if "fork" in get_all_start_methods():
+        workerLexicon = lexicon
+        workerCache = cache
+        pool = get_context("fork").Pool(workers)
+    else:
+        pool = Pool(workers, initializer=initWorker, initargs=(lexicon, cache))
+
+    # imap returns chunks in submission order, so output order matches wordList
+    with pool:
+        for chunkOut, fresh, counts in pool.imap(analyseChunk, jobs):
+            out.write(chunkOut)
+            if cache is not None:
+                for key, record in fresh:
+                    cache.putWord(key, record)
+                cache.addCounts(counts)
+
+
+def buildCoordDict(word, lexicon):
     coordDict = {"suffixes": {}, "prefixes": {}, "stems": {}}
-    stems = morphDict["stems"]
+    stems = lexicon.stems
     wordFound = False
+    wordLen = len(word)
 
     if word in stems:
         wordFound = True
         coordDict["stems"] = word
         return coordDict, stems, wordFound
 
-    # creates every possible sequential ordering
-    allCombos = [((i, j), word[i:j]) for i, j in combinations(range(len(word) + 1), 2)]
-
-    for combo in allCombos:
-        isSuf = False
-        isPre = False
+    automaton = lexicon.automaton
+    affixCoords = set()
 
+    # sorted so each dict keeps the same (i, j) order as the full substring scan
+    for start, end, affixType in sorted(automaton.findAll(word)):
         # checks for suffixes, ignores matches at beginning of words
-        if "-" + combo[1] in morphDict["suffixes"] and combo[1] != word and int(combo[0][0]) != 0:
-            coordDict["suffixes"][combo[0]] = combo[1]
-            isSuf = True
+        if affixType & SUFFIX and start != 0:
+            coordDict["suffixes"][(start, end)] = word[start:end]
+            affixCoords.add((start, end))
 
         # checks for prefixes, ignores matches at end of words
-        if combo[1] + "-" in morphDict["prefixes"] and combo[1] != word and int(combo[0][1]) != len(word):
-            coordDict["prefixes"][combo[0]] = combo[1]
-            isPre = True
+        if affixType & PREFIX and end != wordLen:
+            coordDict["prefixes"][(start, end)] = word[start:end]
+            affixCoords.add((start, end))
 
-        # if neither flag is set, assume this is possibly (part of) the stem
-        if not isSuf and not isPre:
-            coordDict["stems"][combo[0]] = combo[1]
+    # anything not identified as an affix is possibly (part of) the stem
+    for i, j in combinations(range(wordLen + 1), 2):
+        if (i, j) not in affixCoords:
+            coordDict["stems"][(i, j)] = word[i:j]
 
     return coordDict, stems, wordFound
 
 
-def getWordLists(tsvFile):
-    wordList = []
-    wordComparisons = []
-
+def iterComparisons(tsvFile):
     # skip header
-    next(tsvFile)
+    next(tsvFile, None)
 
     for line in tsvFile:
-        w1 = line[0]
-        w2 = line[1]
-        dist = line[2]
+        yield line[0], line[1], line[2]
+
 
-        wordComparisons.append((w1, w2, dist))
+def readComparisons(tsvPath):
+    with open(tsvPath) as wl:
+        yield from iterComparisons(reader(wl, delimiter="\t"))
 
-        if w1 not in wordList:
-            wordList.append(w1)
-        if w2 not in wordList:
-            wordList.append(w2)
 
-    return wordList, wordComparisons
+def getWordLists(comparisons):
+    # comparisons is a stream of (w1, w2, dist), e.g. from iterComparisons or levenshtein.nearPairs
+    # dict keys act as an insertion-ordered set; only the words are kept, not the pairs
+    wordList = {}
+
+    for w1, w2, dist in comparisons:
+        wordList[w1] = None
+        wordList[w2] = None
+
+    return list(wordList)
 
 
 def createMorphDict(lexDict):
@@ -362,15 +1089,37 @@ def createMorphDict(lexDict):
     morphDict["variants"] = variantGroups
     morphDict["has_variants"] = hasVariantList
     morphDict["stems"] = stemList
+    morphDict["automaton"] = AffixAutomaton(prefixList, suffixList)
 
     return morphDict
 
 
+def analyseWordList(wordList, lexicon, nBest=None, cache=None, out=sys.stdout, outFormat="text", pathFilter=None):
+    writer = AnalysisWriter(out, outFormat)
+
+    for word in wordList:
+        writer.write(analyseWord(word, lexicon, nBest, cache, pathFilter))
+
+    writer.flush()
+
+
 def main():
     parser = ArgumentParser(usage=__doc__)
-    parser.add_argument('input1', help='A JSON file of the lexicon')
-    parser.add_argument('input2', help='A TSV file with Levenshtein distances')
+    parser.add_argument('input1', help='A JSON file of the lexicon, or a compiled lexicon (.pkl) from --save-lexicon')
+    parser.add_argument('input2', help='A TSV file with Levenshtein distances, or with --distances a word list ("lexicon" for the lexicon stems)')
     parser.add_argument('--compare', help='Compare words', action='store_true', default=False)       
+    parser.add_argument('--distances', metavar='k', help='Compute word pairs within edit distance k from input2 instead of reading a TSV', default=None, type=int)
+    parser.add_argument('--diffs', metavar='n', help='With --compare, report the n most common morph differences between word pairs', default=0, type=int)
+    parser.add_argument('--save-lexicon', metavar='path', help='Save the compiled lexicon to a .pkl file for faster startup', default=None)
+    parser.add_argument('--nbest', metavar='n', help='Only show the n best analyses per morph type (fewest segments; --filters analyses first cover as much of the word with lexicon morphs as possible)', default=None, type=int)
+    parser.add_argument('--filters', metavar='rules', help=f'Comma-separated filters for combined whole-word analyses ({", ".join(FILTER_RULES)})', default=None)
+    parser.add_argument('--batch', help='Analyse the word list in parallel, writing one JSON line per word', action='store_true', default=False)
+    parser.add_argument('--workers', metavar='n', help='Worker processes for --batch (default: all cores)', default=None, type=int)
+    parser.add_argument('--chunk-size', metavar='n', help='Words per worker task for --batch', default=500, type=int)
+    parser.add_argument('--cache', metavar='path', help='Persistent analysis cache file, reused between runs with the same lexicon', default=None)
+    parser.add_argument('--cache-size', metavar='n', help='Maximum entries in the in-memory analysis cache', default=100000, type=int)
+    parser.add_argument('--cache-stats', help='Write cache hit rates to stderr when finished', action='store_true', default=False)
+    parser.add_argument('--json', help='Write one JSON line per word instead of the text report', action='store_true', default=False)
     parser.add_argument('--size', help='Option to ignore words beneath a certain size', default=0, type=int)
     args = parser.parse_args()
 
@@ -379,35 +1128,54 @@ def main():
     wordSize = args.size
     compare = args.compare
 
-    with open(fileInput) as f:
-        raw = f.read()
-        lexDict = dict(json.loads(raw))
+    if fileInput.endswith(".pkl"):
+        lexicon = MorphLexicon.load(fileInput)
+    else:
+        with open(fileInput) as f:
+            raw = f.read()
+            lexDict = dict(json.loads(raw))
 
-    morphDict = createMorphDict(lexDict)
+        lexicon = MorphLexicon(lexDict)
 
-    with open(compareInput) as wl:
-        distTSV = wl.readlines()
-    
-    tsvFile = reader(distTSV, delimiter="\t")
-    wordList, wordComparisons = getWordLists(tsvFile)
+    if args.save_lexicon:
+        lexicon.save(args.save_lexicon)
 
-    if compare:
-        compareWords(wordComparisons, morphDict)
-        return None
+    pathFilter = FilterPipeline(args.filters.split(",")) if args.filters else None
 
-    for word in wordList:
-        # builds coordDict, which is the indicies of every identifable prefix and suffix and possible stem in a word
-        coordDict, stems, wordFound = buildCoordDict(word, morphDict)
+    if args.cache:
+        cache = AnalysisCache.load(args.cache, lexicon.fingerprint, args.cache_size)
+    elif args.cache_stats or args.diffs:
+        cache = AnalysisCache(args.cache_size, lexicon.fingerprint)
+    else:
+        cache = None
 
-        # check to see if buildCoordDict found that word is already in the dictionary
-        if not wordFound:
-            coordMatch(word, coordDict, stems, lexDict, morphDict)
+    if args.distances is not None:
+        if compareInput == "lexicon":
+            words = sorted(lexicon.stems)
         else:
-            if word in lexDict.keys():
-                sys.stdout.write(f"{word} : {lexDict[word][0][0]}\n\n")
-            else:
-                sys.stdout.write(f"{word} : variant\n\n")
-    
+            with open(compareInput) as wl:
+                words = [line.strip() for line in wl if line.strip()]
+        wordComparisons = nearPairs(words, args.distances)
+    else:
+        wordComparisons = readComparisons(compareInput)
+
+    if compare:
+        # streamed, so the pair list is never held in memory
+        compareWords(wordComparisons, lexicon, cache, args.diffs)
+    else:
+        wordList = getWordLists(wordComparisons)
+
+        if args.batch:
+            batchAnalyse(wordList, lexicon, args.workers, args.chunk_size, args.nbest, cache=cache, pathFilter=pathFilter)
+        else:
+            analyseWordList(wordList, lexicon, args.nbest, cache, outFormat="json" if args.json else "text", pathFilter=pathFilter)
+
+    if cache is not None:
+        if args.cache:
+            cache.save(args.cache)
+        if args.cache_stats:
+            sys.stderr.write(f"Cache stats: {json.dumps(cache.stats())}\n")
+
 
 if __name__ == '__main__':
     main()
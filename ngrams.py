@@ -4,13 +4,11 @@ Get ngrams from file
 """
 
 import sys
-import re
 import json
 
 from argparse import ArgumentParser
-from nltk.util import ngrams
-from collections import Counter, defaultdict
-from scipy.stats import entropy
+from textProcessing import calcProbs, loadTokens, ngrams
+from collections import Counter
 from math import log2
 
 
@@ -34,48 +32,6 @@ def getSurprisal(tokenFreqs, tokenCount, trunc, surprisal):
         sys.stdout.write(json.dumps(outDict, separators=(',', ':')))
 
 
-def calcProbs(ngramFreqs, n):
-    probs = defaultdict(lambda: defaultdict(lambda: 0))
-
-    if n == 2:
-        for bigram, count in ngramFreqs.items():
-            probs[bigram[0]][bigram[1]] += count
-
-        for w1 in probs:
-            total = float(sum(probs[w1].values()))
-            for w2 in probs[w1]:
-                probs[w1][w2] /= total
-    elif n == 3:
-        for trigram, count in ngramFreqs.items():
-            probs[(trigram[0], trigram[1])][trigram[2]] += count
-
-        for w1w2 in probs:
-            total = float(sum(probs[w1w2].values()))
-            for w3 in probs[w1w2]:
-                probs[w1w2][w3] /= total
-    elif n == 4:
-        for fourgram, count in ngramFreqs.items():
-            probs[(fourgram[0], fourgram[1], fourgram[2])][fourgram[3]] += count
-
-        for w1w2w3 in probs:
-            total = float(sum(probs[w1w2w3].values()))
-            for w4 in probs[w1w2w3]:
-                probs[w1w2w3][w4] /= total
-    elif n == 5:
-        for fivegram, count in ngramFreqs.items():
-            probs[(fivegram[0], fivegram[1], fivegram[2], fivegram[3])][fivegram[4]] += count
-
-        for w1w2w3w4 in probs:
-            total = float(sum(probs[w1w2w3w4].values()))
-            for w5 in probs[w1w2w3w4]:
-                probs[w1w2w3w4][w5] /= total
-    else:
-        sys.stderr.write("ERROR: n not valid")
-        raise Exception("n not valid")
-
-    return probs
-
-
 def main():
 
     parser = ArgumentParser(usage=__doc__)
@@ -87,7 +43,8 @@ def main():
     parser.add_argument('--entropy', help='Calculate a specific probability measure', action='store_true', default=False)
     parser.add_argument('--surprisal', help='Calculate surprisal, output to stdout or json', action='store_true', default=False)
     parser.add_argument('--crossentropy', metavar='crossentropy', help='Two sentences to calculate cross-entropy', default=False)
-    parser.add_argument('--truncate', metavar='truncate', help="Truncate probabilities", action='store_true', default=False)
+    parser.add_argument('--truncate', help="Truncate probabilities", action='store_true', default=False)
+    parser.add_argument('--token-cache', metavar='token cache', help='Directory to cache the tokenized input in, reused on later runs', default=None)
     args = parser.parse_args()
 
     fileInput = args.input
@@ -99,6 +56,7 @@ def main():
     entropy = args.entropy
     crossentropyInput = args.crossentropy
     trunc = args.truncate
+    tokenCache = args.token_cache
     nGramLookUp = {2: "bigram", 3: "trigram", 4: "4-gram", 5: "5-gram"}
 
     if predict is not False:
@@ -117,13 +75,7 @@ def main():
             sys.stdout.write(f"WARNING: Calculating {nGramLookUp[n]}s but given string to predict is {predictLen - (n - 1)} word(s) longer than expected. Ignoring.\n")
             predict = False
 
-    with open(fileInput, "r") as textfile:
-        text = textfile.read()
-
-    punctRegex = "[();:.,\'\"?\/\\!”“—-]"
-    textNoPunct = re.sub(punctRegex, "", text)
-
-    tokens = textNoPunct.lower().split()
+    tokens = loadTokens(fileInput, tokenCache)
     tokenCount = len(tokens)
     uniqueCount = len(set(tokens))
     ngramGen = ngrams(tokens, n)
@@ -157,10 +109,14 @@ def main():
             sys.stdout.write(f"{key}: {value}\n")
 
     if getProbs == "print":
+        if entropy:
+            # scipy takes most of a second to import, so it is only loaded for --entropy
+            from scipy.stats import entropy as probEntropy
+
         for k, v in probs.items():
             sys.stdout.write(f"{k}: {dict(v.items())}")
             if entropy:
-                sys.stdout.write(f" Entropy = {entropy(list(v.values()), base=2)} bits\n")
+                sys.stdout.write(f" Entropy = {probEntropy(list(v.values()), base=2)} bits\n")
             else:
                 sys.stdout.write("\n")
     elif getProbs == "json":
@@ -3,37 +3,460 @@
 Generates portmanteaus, converts graphemes to phonemes, and then checks against phonotactic constraints for English
 """
 
-from g2p_en import G2p
+import os
+import sys
+import json
+import heapq
+import pickle
+import numpy as np
+
 from argparse import ArgumentParser
+from collections import OrderedDict, deque
+from multiprocessing import Pool
+
+VOWELS = frozenset("aeiouy")
+FORBIDDEN_BIGRAMS = ("bx cj cv cx dx fq fx gq gx hx jc jf jg jq js jv jw jx jz kq kx mx px pz qb qc qd qf qg qh qj qk ql "
+                     "qm qn qp qs qt qv qw qx qy qz sx vb vf vh vj vm vp vq vt vw vx wx xj xx zj zq zx").split()
+
+
+def buildBigramMask(bigrams):
+    # row per first letter, bit per second letter
+    mask = [0] * 26
+    for bigram in bigrams:
+        mask[ord(bigram[0]) - 97] |= 1 << (ord(bigram[1]) - 97)
+
+    return mask
+
+
+FORBIDDEN_MASK = buildBigramMask(FORBIDDEN_BIGRAMS)
+
+
+def isForbidden(c1, c2):
+    i1 = ord(c1) - 97
+    i2 = ord(c2) - 97
+    if 0 <= i1 < 26 and 0 <= i2 < 26:
+        return FORBIDDEN_MASK[i1] >> i2 & 1
+
+    return 0
+
+
+def cleanPrefixes(word):
+    # clean[k] is True when word[:k] has no forbidden bigram, vowel[k] when it has a vowel
+    clean = [True]
+    vowel = [False]
+    for k, char in enumerate(word):
+        clean.append(clean[-1] and not (k and isForbidden(word[k - 1], char)))
+        vowel.append(vowel[-1] or char in VOWELS)
+
+    return clean, vowel
+
+
+def cleanSuffixes(word):
+    # clean[k] is True when word[k:] has no forbidden bigram, vowel[k] when it has a vowel
+    wordLen = len(word)
+    clean = [True] * (wordLen + 1)
+    vowel = [False] * (wordLen + 1)
+    for k in range(wordLen - 1, -1, -1):
+        clean[k] = clean[k + 1] and not (k + 1 < wordLen and isForbidden(word[k], word[k + 1]))
+        vowel[k] = vowel[k + 1] or word[k] in VOWELS
+
+    return clean, vowel
+
+# g2p_en loads a neural model, so it is imported and built once, only when a word is missing from the dictionary
+sharedG2p = None
+
+
+def getG2p():
+    global sharedG2p
+
+    if sharedG2p is None:
+        from g2p_en import G2p
+        sharedG2p = G2p()
+
+    return sharedG2p
+
+
+def loadCmuDict(path):
+    # "WORD  P1 P2 ..." per line; only the first pronunciation of each word is kept
+    pronunciations = {}
+    phonemes = {}
+
+    with open(path, encoding="latin-1") as cmuFile:
+        for line in cmuFile:
+            if not line.strip() or line.startswith(";;;"):
+                continue
+            word, *phones = line.split()
+            word = word.lower()
+            if word.endswith(")"):
+                continue
+            # share one string per phoneme across all entries
+            pronunciations.setdefault(word, tuple(phonemes.setdefault(p, p) for p in phones))
+
+    return pronunciations
+
+
+def splitPhones(out):
+    # G2p output for several words is one phone list with " " between words
+    prons = []
+    current = []
+
+    for phone in out:
+        if phone == " ":
+            prons.append(tuple(current))
+            current = []
+        else:
+            current.append(phone)
+    prons.append(tuple(current))
+
+    return prons
+
+
+class Pronouncer:
+    """
+    Grapheme to phoneme lookup: the CMU dictionary first, then one shared G2p model for the rest,
+    batched where the output can be split back per word. Model results go into an LRU cache
+    that can be saved between runs.
+    """
+
+    def __init__(self, cmuDictPath=None, cachePath=None, cacheSize=100000):
+        self.dictionary = loadCmuDict(cmuDictPath) if cmuDictPath else {}
+        self.cachePath = cachePath
+        self.cacheSize = cacheSize
+        self.cache = OrderedDict()
+
+        if cachePath and os.path.exists(cachePath):
+            with open(cachePath, "rb") as cacheFile:
+                self.cache = pickle.load(cacheFile)
+
+    def lookup(self, word):
+        pron = self.dictionary.get(word)
+        if pron is None:
+            pron = self.cache.get(word)
+            if pron is not None:
+                self.cache.move_to_end(word)
+
+        return pron
+
+    def pronounceMany(self, words):
+        prons = {}
+        missing = []
+
+        for word in words:
+            if word not in prons:
+                pron = self.lookup(word)
+                prons[word] = pron
+                if pron is None:
+                    missing.append(word)
+
+        if missing:
+            for word, pron in zip(missing, self.predict(missing)):
+                prons[word] = pron
+                self.cache[word] = pron
+                if len(self.cache) > self.cacheSize:
+                    self.cache.popitem(last=False)
+
+        return prons
+
+    def pronounce(self, word):
+        return self.pronounceMany([word])[word]
+
+    def predict(self, words):
+        # one model call for the batch when that is safe, otherwise one call per word
+        g2p = getG2p()
+        homographs = getattr(g2p, "homograph2features", {})
+        prons = {}
+
+        # G2p spells out numbers, drops characters and splits apostrophes, so only plain alphabetic
+        # words are batched, where one word always gives one group. Homographs are picked by part
+        # of speech, tagged from the neighbouring words, so they are run alone too to get the same
+        # (cacheable) pronunciation whatever else is in the batch
+        batch = [word for word in words if word.isascii() and word.isalpha() and word.lower() not in homographs]
+        if batch:
+            groups = splitPhones(g2p(" ".join(batch)))
+            # should always hold; if not, nothing from the batch is trusted and every word is run alone
+            if len(groups) == len(batch):
+                prons.update(zip(batch, groups))
+
+        for word in words:
+            if word not in prons:
+                prons[word] = tuple(phone for phone in g2p(word) if phone != " ")
+
+        return [prons[word] for word in words]
+
+    def save(self):
+        if self.cachePath:
+            with open(self.cachePath, "wb") as cacheFile:
+                pickle.dump(self.cache, cacheFile, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+# Constraints:
+#   - no word initial NX or NG
+#   - if first phoneme is S, then only P T K M N L W
+#   - if SH, then R
+#   - if second letter = l -> first letter = pbf, if second letter = r -> first letter = pbft TH kg, if second letter = w -> first letter = td TH k
+#     (plus S from the S rule, KG before L and D before R, as in clean, glow, drink)
+#   - skr/smj are possible, spw/stl/stw/snj are not
+#   - word final mb NGg mv nTHIS not possible, neither lTHIS lDj lg lNG
+# Other languages are added as JSON files of the same shape and loaded with --rules
+ENGLISH_PHONOTACTICS = {
+    "vowels": ["AA", "AE", "AH", "AO", "AW", "AY", "EH", "ER", "EY", "IH", "IY", "OW", "OY", "UH", "UW"],
+    "consonants": ["B", "CH", "D", "DH", "F", "G", "HH", "JH", "K", "L", "M", "N", "NG", "NX", "P", "R", "S", "SH", "T", "TH", "V", "W", "Y", "Z", "ZH"],
+    "forbiddenInitial": ["NX", "NG"],
+    "onsetFollowers": {"S": ["P", "T", "K", "M", "N", "L", "W"], "SH": ["R"]},
+    "onsetLeaders": {
+        "L": ["P", "B", "F", "K", "G", "S"],
+        "R": ["P", "B", "F", "T", "TH", "K", "G", "D", "SH"],
+        "W": ["T", "D", "TH", "K", "S"],
+    },
+    "forbiddenOnsets": [["S", "P", "W"], ["S", "T", "L"], ["S", "T", "W"], ["S", "N", "Y"]],
+    "forbiddenCodas": [["M", "B"], ["NG", "G"], ["M", "V"], ["N", "DH"], ["L", "DH"], ["L", "JH"], ["L", "G"], ["L", "NG"]],
+    "requireVowel": True,
+}
+
+
+def loadPhonotactics(path):
+    with open(path) as rulesFile:
+        return json.load(rulesFile)
+
+
+def stripStress(phone):
+    # AH1 -> AH
+    return phone.rstrip("012")
+
+
+class PhonotacticAcceptor:
+    """
+    Compiles a phonotactic rule set into a deterministic automaton over integer phoneme ids.
+    States combine the onset position (previous consonant, progress through forbidden onsets)
+    with an Aho-Corasick state over forbidden codas; the full transition table is built up front,
+    so checking a pronunciation is one table lookup per phoneme.
+    """
+
+    def __init__(self, rules=ENGLISH_PHONOTACTICS):
+        self.rules = rules
+        self.vowels = frozenset(rules["vowels"])
+        self.forbiddenInitial = frozenset(rules.get("forbiddenInitial", ()))
+        self.onsetFollowers = {k: frozenset(v) for k, v in rules.get("onsetFollowers", {}).items()}
+        self.onsetLeaders = {k: frozenset(v) for k, v in rules.get("onsetLeaders", {}).items()}
+        self.requireVowel = rules.get("requireVowel", True)
+
+        # id 0 is any phoneme the rules do not mention
+        symbols = ["?"] + sorted(set(rules["vowels"]) | set(rules.get("consonants", ())))
+        self.ids = {phone: i for i, phone in enumerate(symbols)}
+        self.symbols = symbols
+
+        self.buildOnsetTrie(rules.get("forbiddenOnsets", ()))
+        self.buildCodaAutomaton(rules.get("forbiddenCodas", ()))
+        self.compile()
+
+    def buildOnsetTrie(self, onsets):
+        # anchored at the word start, reaching a terminal node rejects
+        self.onsetGoto = [{}]
+        self.onsetEnd = [False]
 
-def phonotactics(blendedWordList):
+        for onset in onsets:
+            node = 0
+            for phone in onset:
+                if phone not in self.onsetGoto[node]:
+                    self.onsetGoto[node][phone] = len(self.onsetGoto)
+                    self.onsetGoto.append({})
+                    self.onsetEnd.append(False)
+                node = self.onsetGoto[node][phone]
+            self.onsetEnd[node] = True
+
+    def buildCodaAutomaton(self, codas):
+        # Aho-Corasick over the forbidden codas; ending in a state with a match rejects
+        self.codaGoto = [{}]
+        self.codaFail = [0]
+        self.codaMatch = [False]
+
+        for coda in codas:
+            node = 0
+            for phone in coda:
+                if phone not in self.codaGoto[node]:
+                    self.codaGoto[node][phone] = len(self.codaGoto)
+                    self.codaGoto.append({})
+                    self.codaFail.append(0)
+                    self.codaMatch.append(False)
+                node = self.codaGoto[node][phone]
+            self.codaMatch[node] = True
+
+        queue = deque(self.codaGoto[0].values())
+        while queue:
+            node = queue.popleft()
+            self.codaMatch[node] = self.codaMatch[node] or self.codaMatch[self.codaFail[node]]
+            for phone, nextNode in self.codaGoto[node].items():
+                fail = self.codaFail[node]
+                while fail and phone not in self.codaGoto[fail]:
+                    fail = self.codaFail[fail]
+                self.codaFail[nextNode] = self.codaGoto[fail].get(phone, 0)
+                queue.append(nextNode)
+
+    def codaStep(self, node, phone):
+        while node and phone not in self.codaGoto[node]:
+            node = self.codaFail[node]
+
+        return self.codaGoto[node].get(phone, 0)
+
+    def step(self, state, phone):
+        # state is (inOnset, previous onset consonant, onset trie node or -1, coda node); None rejects
+        inOnset, prev, onsetNode, codaNode = state
+        codaNode = self.codaStep(codaNode, phone)
+
+        if not inOnset:
+            return False, None, -1, codaNode
+
+        if phone in self.vowels:
+            return False, None, -1, codaNode
+
+        if prev is None:
+            if phone in self.forbiddenInitial:
+                return None
+        else:
+            if prev in self.onsetFollowers and phone not in self.onsetFollowers[prev]:
+                return None
+            if phone in self.onsetLeaders and prev not in self.onsetLeaders[phone]:
+                return None
+
+        if onsetNode >= 0:
+            onsetNode = self.onsetGoto[onsetNode].get(phone, -1)
+            if onsetNode >= 0 and self.onsetEnd[onsetNode]:
+                return None
+
+        return True, phone, onsetNode, codaNode
+
+    def compile(self):
+        # explore every reachable state once and number them; -1 is the reject state
+        start = (True, None, 0, 0)
+        stateIDs = {start: 0}
+        states = [start]
+        self.table = []
+        self.accepting = []
+
+        i = 0
+        while i < len(states):
+            state = states[i]
+            row = []
+            for phone in self.symbols:
+                nextState = self.step(state, phone)
+                if nextState is None:
+                    row.append(-1)
+                    continue
+                if nextState not in stateIDs:
+                    stateIDs[nextState] = len(states)
+                    states.append(nextState)
+                row.append(stateIDs[nextState])
+            self.table.append(row)
+
+            inOnset, prev, onsetNode, codaNode = state
+            self.accepting.append(not self.codaMatch[codaNode] and not (self.requireVowel and inOnset))
+            i += 1
+
+    def encode(self, phones):
+        return [self.ids.get(stripStress(phone), 0) for phone in phones]
+
+    def acceptsIDs(self, phoneIDs):
+        table = self.table
+        state = 0
+
+        for phoneID in phoneIDs:
+            state = table[state][phoneID]
+            if state < 0:
+                return False
+
+        return self.accepting[state]
+
+    def accepts(self, phones):
+        return self.acceptsIDs(self.encode(phones))
+
+    def filterBatch(self, pronunciations):
+        return [self.accepts(phones) for phones in pronunciations]
+
+
+def phonotactics(blendedWordList, prons, acceptor=None):
+    # keeps blends whose pronunciation passes the phonotactic automaton
+    if acceptor is None:
+        acceptor = PhonotacticAcceptor()
+
+    keep = acceptor.filterBatch([prons[blend] for blend in blendedWordList])
+
+    return [blend for blend, ok in zip(blendedWordList, keep) if ok]
+
+
+class NgramScorer:
+    """
+    Add-k smoothed n-gram model over characters or phonemes, trained on a lexicon.
+    Candidates are scored in batches as padded integer arrays: every n-gram becomes one index
+    into a dense log-probability table, and scores are the mean log-probability per n-gram.
+    """
+
+    def __init__(self, sequences, n=3, k=0.1):
+        self.n = n
+        # 0 pads, 1 marks the start, 2 the end, 3 is any symbol not seen in training
+        symbols = sorted({symbol for seq in sequences for symbol in seq})
+        self.ids = {symbol: i + 4 for i, symbol in enumerate(symbols)}
+        self.vocabSize = len(symbols) + 4
+
+        grams = np.concatenate([self.ngramIndices(self.encode(seq)) for seq in sequences])
+        counts = np.bincount(grams, minlength=self.vocabSize ** n).reshape(-1, self.vocabSize).astype(float)
+        contextTotals = counts.sum(axis=1, keepdims=True)
+        self.logProbs = (np.log(counts + k) - np.log(contextTotals + k * self.vocabSize)).ravel()
+
+    def encode(self, seq):
+        return np.array([1] * (self.n - 1) + [self.ids.get(symbol, 3) for symbol in seq] + [2], dtype=np.int64)
+
+    def ngramIndices(self, encoded):
+        # base-vocabSize number of each window, works on 1-d sequences and on batches (last axis)
+        width = encoded.shape[-1] - self.n + 1
+        indices = np.zeros(encoded.shape[:-1] + (width,), dtype=np.int64)
+        for i in range(self.n):
+            indices = indices * self.vocabSize + encoded[..., i:i + width]
+
+        return indices
+
+    def scoreBatch(self, sequences):
+        if not sequences:
+            return np.zeros(0)
+
+        encoded = [self.encode(seq) for seq in sequences]
+        lengths = np.array([len(seq) for seq in encoded])
+        batch = np.zeros((len(encoded), lengths.max()), dtype=np.int64)
+        for row, seq in enumerate(encoded):
+            batch[row, :len(seq)] = seq
+
+        indices = self.ngramIndices(batch)
+        gramCounts = lengths - self.n + 1
+        mask = np.arange(indices.shape[1])[np.newaxis, :] < gramCounts[:, np.newaxis]
+
+        return np.where(mask, self.logProbs[indices], 0.0).sum(axis=1) / gramCounts
+
+    def topK(self, candidates, k, sequences=None):
+        # sequences are what gets scored (e.g. pronunciations), candidates what gets returned
+        scores = self.scoreBatch(candidates if sequences is None else sequences)
+
+        return heapq.nlargest(k, zip(scores.tolist(), candidates))
 
-    # Constraints: 
-    #   - no word initial NX or NG
-    #   - if first phoneme is S, then only P T K M N L W
-    #   - if SH, then R
-    #   - if second letter = l -> first letter = pbf, if second letter = r -> first letter = pbft TH kg, if second letter = w -> first letter = td TH k
-    #   - skr/smj are possible, spw/stl/stw/snj are not
-    #   - word final mb NGg mv nTHIS not possible, neither lTHIS lDj lg lNG
-    
-    return blendedWordList
 
 def orthoFilter(blendedWordList):
     filteredList = []
 
     # must have a vowel or semivowel
-    # cannot contain:   bx, cj, cv, cx, dx, fq, fx, gq, gx, hx, jc, jf, jg, jq, js, jv, jw, jx, jz, kq, kx, mx, px, pz, qb, qc, qd, qf, qg, qh, qj, qk, ql, 
-    #                   qm, qn, qp, qs, qt, qv, qw, qx, qy, qz, sx, vb, vf, vh, vj, vm, vp, vq, vt, vw, vx, wx, xj, xx, zj, zq, zx
+    # cannot contain any of FORBIDDEN_BIGRAMS
 
     for blend in blendedWordList:
-        if "a" in blend or "e" in blend or "i" in blend or "o" in blend or "u" in blend or "y" in blend:
-            filteredList.append(blend)
+        if VOWELS.isdisjoint(blend):
+            continue
+        if any(isForbidden(c1, c2) for c1, c2 in zip(blend, blend[1:])):
+            continue
+        filteredList.append(blend)
 
 
     return filteredList
 
 def blendWord(w1, w2):
-    blendedWordList = []
+    # the orthographic filter is applied while blending: each candidate is a prefix of one word
+    # plus a suffix of the other, so only the junction bigram needs checking per candidate
+    blends = {}
 
     if len(w1) > len(w2):
         shortWord = w2
@@ -42,35 +465,118 @@ def blendWord(w1, w2):
         shortWord = w1
         longWord = w2
 
-    for i in range(len(shortWord) - 1):
-        for j in range(len(longWord) - 1):
-            blendedWordList.append(shortWord[:len(shortWord) - i - 1] + longWord[len(longWord) - j - 1:])
-            blendedWordList.append(longWord[:len(longWord) - j - 1] + shortWord[len(shortWord) - i - 1:])
+    shortLen = len(shortWord)
+    longLen = len(longWord)
+    shortPreClean, shortPreVowel = cleanPrefixes(shortWord)
+    shortSufClean, shortSufVowel = cleanSuffixes(shortWord)
+    longPreClean, longPreVowel = cleanPrefixes(longWord)
+    longSufClean, longSufVowel = cleanSuffixes(longWord)
+
+    for i in range(shortLen - 1):
+        shortCut = shortLen - i - 1
+        for j in range(longLen - 1):
+            longCut = longLen - j - 1
+
+            if shortPreClean[shortCut] and longSufClean[longCut] and (shortPreVowel[shortCut] or longSufVowel[longCut]) and not isForbidden(shortWord[shortCut - 1], longWord[longCut]):
+                blends.setdefault(shortWord[:shortCut] + longWord[longCut:], None)
+
+            if longPreClean[longCut] and shortSufClean[shortCut] and (longPreVowel[longCut] or shortSufVowel[shortCut]) and not isForbidden(longWord[longCut - 1], shortWord[shortCut]):
+                blends.setdefault(longWord[:longCut] + shortWord[shortCut:], None)
+
+    # dict keys keep the first occurrence of each blend, in generation order
+    return list(blends)
+
+
+# second word list for bulk mode, set once per worker
+bulkWords = None
 
-    blendedWordList = orthoFilter(blendedWordList)
 
-    return blendedWordList
+def initBulkWorker(words):
+    global bulkWords
+
+    bulkWords = words
+
+
+def blendAgainstList(w1):
+    lines = []
+    for w2 in bulkWords:
+        for blend in blendWord(w1, w2):
+            lines.append(f"{w1}\t{w2}\t{blend}\n")
+
+    return "".join(lines)
+
+
+def bulkBlend(words1, words2, workers=None, out=sys.stdout):
+    # every pair from the two lists, one task per word of the first list, output in input order
+    with Pool(workers, initializer=initBulkWorker, initargs=(words2,)) as pool:
+        for chunkOut in pool.imap(blendAgainstList, words1, chunksize=16):
+            out.write(chunkOut)
+
+
+def readWordList(path):
+    with open(path) as wordFile:
+        return [line.strip().lower() for line in wordFile if line.strip()]
 
 
 def main():
 
     parser = ArgumentParser(usage=__doc__)
-    parser.add_argument('word1', help='first word')
-    parser.add_argument('word2', help='second word')
+    parser.add_argument('word1', help='first word (with --bulk, a file with one word per line)')
+    parser.add_argument('word2', help='second word (with --bulk, a file with one word per line)')
+    parser.add_argument('--bulk', help='Blend every pair from two word lists, output as word1, word2, blend TSV', action='store_true', default=False)
+    parser.add_argument('--phonemes', help='Print the pronunciation of each blend', action='store_true', default=False)
+    parser.add_argument('--cmudict', metavar='path', help='CMU pronouncing dictionary file, checked before the G2P model', default=None)
+    parser.add_argument('--pron-cache', metavar='path', help='Persistent cache of G2P model pronunciations', default=None)
+    parser.add_argument('--phonotactics', help='Drop blends whose pronunciation breaks the phonotactic rules (implies --phonemes)', action='store_true', default=False)
+    parser.add_argument('--rules', metavar='path', help='JSON phonotactic rule set (default: English)', default=None)
+    parser.add_argument('--rank', metavar='k', help='Only output the k most plausible blends under an n-gram model of the --cmudict lexicon', default=None, type=int)
+    parser.add_argument('--rank-unit', metavar='unit', help='Rank on letters or phonemes', default="char", choices=["char", "phoneme"])
+    parser.add_argument('--workers', metavar='n', help='Worker processes for --bulk (default: all cores)', default=None, type=int)
     args = parser.parse_args()
 
     w1 = args.word1
     w2 = args.word2
 
+    if args.bulk:
+        bulkBlend(readWordList(w1), readWordList(w2), args.workers)
+        return None
+
     blendedWordList = blendWord(w1, w2)
 
 #    blendedWordList = ["spot", "stop", "stew", "Scot", "smock", "snot", "slot", "swat", "shred"]
 
-    for portmanteau in blendedWordList:
-#        g2p = G2p()
-#        out = g2p(portmanteau)
-        print(portmanteau)
-#        print(f"{portmanteau}: {out}")
+    prons = None
+    pronouncer = None
+    if args.phonemes or args.phonotactics or (args.rank and args.rank_unit == "phoneme"):
+        pronouncer = Pronouncer(args.cmudict, args.pron_cache)
+        prons = pronouncer.pronounceMany(blendedWordList)
+        pronouncer.save()
+
+        if args.phonotactics:
+            rules = loadPhonotactics(args.rules) if args.rules else ENGLISH_PHONOTACTICS
+            blendedWordList = phonotactics(blendedWordList, prons, PhonotacticAcceptor(rules))
+
+    if args.rank:
+        if args.cmudict is None:
+            sys.stderr.write("ERROR: --rank needs --cmudict to train the n-gram model.\n")
+            raise Exception("No lexicon to rank with")
+
+        # the pronouncer has already parsed the same file
+        lexicon = pronouncer.dictionary if pronouncer is not None else loadCmuDict(args.cmudict)
+        if args.rank_unit == "phoneme":
+            scorer = NgramScorer([[stripStress(p) for p in pron] for pron in lexicon.values()])
+            ranked = scorer.topK(blendedWordList, args.rank, [[stripStress(p) for p in prons[blend]] for blend in blendedWordList])
+        else:
+            scorer = NgramScorer(list(lexicon))
+            ranked = scorer.topK(blendedWordList, args.rank)
+        blendedWordList = [blend for score, blend in ranked]
+
+    if prons is not None and (args.phonemes or args.phonotactics):
+        for portmanteau in blendedWordList:
+            print(f"{portmanteau}: {' '.join(prons[portmanteau])}")
+    else:
+        for portmanteau in blendedWordList:
+            print(portmanteau)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+'''
+-- timeStartup - best wall time of a script's --help in a fresh interpreter, i.e. import plus argument parsing
+-- slowestImports - the modules that dominate a script's startup, from python -X importtime
+-- main - checks every CLI against a startup budget and exits non-zero if any is over it
+'''
+
+import os
+import sys
+import time
+import subprocess
+
+from argparse import ArgumentParser
+
+CLI_SCRIPTS = ["ngrams.py", "textGen.py", "summariseText.py", "morphAnalyser.py", "portmanteauGen.py", "levenshtein.py"]
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def timeStartup(script, runs):
+    # the best of several runs, so a cold disk cache or a busy machine doesn't fail the check
+    best = float("inf")
+
+    for _ in range(runs):
+        startTime = time.perf_counter()
+        result = subprocess.run([sys.executable, script, "--help"], cwd=SCRIPT_DIR, capture_output=True)
+        best = min(best, time.perf_counter() - startTime)
+
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr.decode("utf-8", "replace"))
+            raise Exception(f"{script} --help exited with {result.returncode}")
+
+    return best
+
+
+def slowestImports(script, top):
+    # importtime lines look like "import time: self [us] | cumulative | imported package"
+    result = subprocess.run([sys.executable, "-X", "importtime", script, "--help"], cwd=SCRIPT_DIR, capture_output=True, text=True)
+    imports = []
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        selfTime, cumulative, name = line[len("import time:"):].split("|")
+        # only top level imports, their cumulative time already covers what they pull in
+        if not name.startswith("  "):
+            imports.append((int(cumulative) / 1e6, name.strip()))
+
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = ArgumentParser(usage=__doc__)
+    parser.add_argument('scripts', metavar='scripts', help='Scripts to check, defaults to every CLI in the repo', nargs='*', default=CLI_SCRIPTS)
+    parser.add_argument('--budget', metavar='seconds', help='Maximum startup time per script', type=float, default=0.5)
+    parser.add_argument('--runs', metavar='runs', help='Runs per script, the best is kept', type=int, default=5)
+    parser.add_argument('--imports', metavar='top imports', help='Show the n slowest imports of every script, not only those over budget', type=int, default=0)
+    args = parser.parse_args()
+
+    overBudget = []
+
+    # an empty interpreter is the floor every script pays
+    baseline = float("inf")
+    for _ in range(args.runs):
+        startTime = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"])
+        baseline = min(baseline, time.perf_counter() - startTime)
+
+    sys.stdout.write(f"{'script':20}  startup   budget {args.budget:.3f}s  (bare interpreter {baseline:.3f}s)\n")
+
+    for script in args.scripts:
+        startup = timeStartup(script, args.runs)
+        status = "ok" if startup <= args.budget else "OVER"
+        sys.stdout.write(f"{script:20}  {startup:.3f}s   {status}\n")
+
+        if startup > args.budget:
+            overBudget.append(script)
+
+        if startup > args.budget or args.imports:
+            for seconds, name in slowestImports(script, args.imports or 5):
+                sys.stdout.write(f"    {seconds:.3f}s  {name}\n")
+
+    if overBudget:
+        sys.stderr.write(f"ERROR: over the {args.budget}s startup budget: {', '.join(overBudget)}\n")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
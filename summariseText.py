@@ -4,17 +4,21 @@ Summarise a text file based on weighting of sentences
 """
 
 import sys
-import re
+import os
+import json
+import time
 import numpy as np
-import networkx as nx
 
 from argparse import ArgumentParser
-from nltk.tokenize import sent_tokenize
-from nltk.cluster.util import cosine_distance
-from nltk.corpus import stopwords
-from gensim.models import TfidfModel
-from gensim.corpora import Dictionary
-from gensim.summarization.bm25 import BM25
+from multiprocessing import Pool
+from textProcessing import stripPunct
+
+# nltk, gensim and scipy.sparse are imported inside the functions that need them:
+# together they take seconds to import, and most runs only touch one model
+
+# per-process state for batch mode, filled once by initWorker
+workerStopWords = None
+workerIdfCache = None
 
 
 def getSentenceScore(model, tokens, genDict):
@@ -38,32 +42,83 @@ def getSentenceScore(model, tokens, genDict):
 
 
 def getBOW(tokens):
+    from gensim.corpora import Dictionary
+
     genDict = Dictionary(tokens)
     bow = [genDict.doc2bow(token) for token in tokens]
 
     return bow, genDict
 
 
-def bm25Summarise(tokens):
-    bow, genDict = getBOW(tokens)
-    model = BM25(bow)
+def bm25Idf(docFreqs, docCount, epsilon=0.25):
+    idf = np.log(docCount - docFreqs + 0.5) - np.log(docFreqs + 0.5)
+    # negative idfs (terms in more than half the documents) are floored to a fraction of the mean
+    idf[idf < 0] = epsilon * idf.mean()
+
+    return idf
+
+
+def bm25Weights(termMatrix, k1=1.5, b=0.75, epsilon=0.25, idf=None, avgDocLen=None, docLens=None):
+    # Okapi BM25 weight of every (document, term) pair, same parameters as the old gensim BM25
+    # idf and avgDocLen can come from a corpus cache instead of the document's own sentences
+    termMatrix = termMatrix.tocsr()
+    docCount = termMatrix.shape[0]
 
-    rankedScores = {}
-    sumScore = 0
-    vectorCount = 0
+    if docLens is None:
+        docLens = np.asarray(termMatrix.sum(axis=1)).ravel()
+    if avgDocLen is None:
+        avgDocLen = docLens.sum() / docCount
+    if idf is None:
+        docFreqs = np.bincount(termMatrix.indices, minlength=termMatrix.shape[1])
+        idf = bm25Idf(docFreqs, docCount, epsilon)
 
-    for i, vector in enumerate(bow):
-        vectorSum = sum(model.get_scores(vector))
-        rankedScores[i] = vectorSum
-        sumScore += vectorSum
-        vectorCount += 1
+    weights = termMatrix.copy().astype(float)
+    rowLens = np.repeat(docLens, np.diff(weights.indptr))
+    tf = weights.data
+    weights.data = idf[weights.indices] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * rowLens / avgDocLen))
 
-    avgScore = sumScore / vectorCount
+    return weights
+
+
+def bm25Summarise(tokens, idfCache=None):
+    if idfCache is None:
+        termMatrix, vocab = buildTermMatrix(tokens)
+        weights = bm25Weights(termMatrix)
+    else:
+        termMatrix, vocab = buildTermMatrix(tokens, vocab=idfCache["vocab"])
+        docLens = np.array([len(line) for line in tokens], dtype=float)
+        weights = bm25Weights(termMatrix, idf=idfCache["bm25"], avgDocLen=idfCache["avgDocLen"], docLens=docLens)
+
+    # summing a sentence's score against every document collapses to one product with the column totals
+    termTotals = np.asarray(weights.sum(axis=0)).ravel()
+    sentenceScores = termMatrix @ termTotals
+
+    rankedScores = dict(enumerate(sentenceScores.tolist()))
+    avgScore = sentenceScores.sum() / len(tokens)
 
     return rankedScores, avgScore
 
 
-def tfidfModel(tokens):
+def cachedTfidfScores(tokens, idfCache):
+    # same weighting as gensim's default TfidfModel (tf * log2 idf, L2 normalised) with corpus idf
+    termMatrix, vocab = buildTermMatrix(tokens, vocab=idfCache["vocab"])
+    weights = termMatrix.multiply(idfCache["tfidf"][np.newaxis, :]).tocsr()
+    norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+    lineSums = np.asarray(weights.sum(axis=1)).ravel()
+    scores = np.divide(lineSums, norms, out=np.zeros_like(lineSums), where=norms > 0)
+
+    rankedDict = {k: v for k, v in sorted(enumerate(scores.tolist()), key=lambda item: item[1], reverse=True)}
+    avgScore = scores.sum() / len(tokens)
+
+    return rankedDict, avgScore
+
+
+def tfidfModel(tokens, idfCache=None):
+    if idfCache is not None:
+        return cachedTfidfScores(tokens, idfCache)
+
+    from gensim.models import TfidfModel
+
     bow, genDict = getBOW(tokens)
     model = TfidfModel(bow)
     rankedScores, avgScore = getSentenceScore(model, tokens, genDict)
@@ -71,21 +126,177 @@ def tfidfModel(tokens):
     return rankedScores, avgScore
 
 
-def cosineModel(sentences, langStopWords, topN):
-    summary = []
+def buildTermMatrix(sentences, langStopWords=None, vocab=None):
+    # one row per sentence, one column per term; duplicate (row, col) entries are summed into counts
+    # a given vocab (a sorted term array from the IDF cache) is fixed: terms outside it are skipped
+    from scipy.sparse import csr_matrix
+
+    stopSet = set(langStopWords) if langStopWords else set()
+    fixedVocab = vocab is not None
+    rows = []
+    cols = []
+
+    if fixedVocab:
+        words = []
+        for i, sentence in enumerate(sentences):
+            for w in sentence:
+                w = w.lower()
+                if w not in stopSet:
+                    rows.append(i)
+                    words.append(w)
+        cols = vocabLookup(vocab, words)
+        known = cols >= 0
+        rows = np.asarray(rows, dtype=np.int64)[known]
+        cols = cols[known]
+        vocabSize = len(vocab)
+    else:
+        vocab = {}
+        for i, sentence in enumerate(sentences):
+            for w in sentence:
+                w = w.lower()
+                if w in stopSet:
+                    continue
+                rows.append(i)
+                cols.append(vocab.setdefault(w, len(vocab)))
+        vocabSize = len(vocab)
+
+    data = np.ones(len(rows))
+    termMatrix = csr_matrix((data, (rows, cols)), shape=(len(sentences), vocabSize))
+
+    return termMatrix, vocab
+
+
+def vocabLookup(terms, words):
+    # column of each word in a sorted array of UTF-8 terms, -1 if it is not there
+    # words longer than the array's width cannot be in it, and would be truncated by the cast
+    encoded = [w.encode("utf-8") for w in words]
+    width = terms.dtype.itemsize
+    cols = np.full(len(encoded), -1, dtype=np.int64)
+
+    if not len(terms) or not encoded:
+        return cols
+
+    fits = np.fromiter((len(w) <= width for w in encoded), dtype=bool, count=len(encoded))
+    keys = np.array(encoded, dtype=terms.dtype)
+    pos = np.minimum(np.searchsorted(terms, keys), len(terms) - 1)
+    found = fits & (terms[pos] == keys)
+    cols[found] = pos[found]
+
+    return cols
+
+
+def cosineSimMatrix(sentences, langStopWords=None, topK=None, blockEntries=1 << 20):
+    # with topK, the product is built a block of rows at a time and each row is cut to its k
+    # strongest edges straight away, so the full N x N matrix never exists
+    from scipy.sparse import csr_matrix, diags
+
+    termMatrix, vocab = buildTermMatrix(sentences, langStopWords)
+    sentCount = termMatrix.shape[0]
+
+    # L2 normalise rows so a single product gives the cosine of every pair
+    # sentences with no countable terms are left as zero rows (similarity 0)
+    norms = np.sqrt(np.asarray(termMatrix.multiply(termMatrix).sum(axis=1)).ravel())
+    invNorms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    normMatrix = (diags(invNorms) @ termMatrix).tocsr()
+    normMatrixT = normMatrix.T.tocsc()
+
+    if not topK:
+        simMatrix = (normMatrix @ normMatrixT).tocsr()
+        simMatrix.setdiag(0)
+        simMatrix.eliminate_zeros()
+        return simMatrix
+
+    # rows per block, so a block holds at most about blockEntries similarities
+    blockRows = max(1, blockEntries // max(sentCount, 1))
+    rows = []
+    cols = []
+    data = []
+
+    for blockStart in range(0, sentCount, blockRows):
+        block = (normMatrix[blockStart:blockStart + blockRows] @ normMatrixT).tocsr()
+        # the block's diagonal (self-similarity) sits blockStart columns to the right
+        block.setdiag(0, k=blockStart)
+        block.eliminate_zeros()
+        blockRowIDs, blockCols, blockData = rowTopK(block, topK)
+        rows.append(blockRowIDs + blockStart)
+        cols.append(blockCols)
+        data.append(blockData)
+
+    if rows:
+        rows, cols, data = np.concatenate(rows), np.concatenate(cols), np.concatenate(data)
+    kept = csr_matrix((data, (rows, cols)), shape=(sentCount, sentCount))
+
+    # symmetrise so the graph stays undirected
+    return kept.maximum(kept.T).tocsr()
+
+
+def rowTopK(matrix, topK):
+    # (row, col, value) arrays of the k largest entries in each row of a csr matrix
+    rows = []
+    cols = []
+    data = []
+
+    for i in range(matrix.shape[0]):
+        start, end = matrix.indptr[i], matrix.indptr[i + 1]
+        rowData = matrix.data[start:end]
+        rowCols = matrix.indices[start:end]
+
+        if len(rowData) > topK:
+            keep = np.argpartition(rowData, -topK)[-topK:]
+            rowData = rowData[keep]
+            rowCols = rowCols[keep]
+
+        rows.append(np.full(len(rowData), i))
+        cols.append(rowCols)
+        data.append(rowData)
+
+    if not rows:
+        return np.array([], dtype=int), np.array([], dtype=int), np.array([])
+
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(data)
+
 
-    sentLen = len(sentences)
-    simMatrix = np.zeros((sentLen, sentLen))
+def textRank(simMatrix, alpha=0.85, tol=1.0e-6, maxIter=100, nstart=None):
+    # weighted PageRank by power iteration, matching nx.pagerank on an undirected weighted graph
+    from scipy.sparse import diags
 
-    for i in range(sentLen):
-        for j in range(sentLen):
-            if i == j:
-                continue
-            simMatrix[i][j] = sentenceSim(sentences[i], sentences[j], langStopWords)
+    simMatrix = simMatrix.tocsr()
+    nodeCount = simMatrix.shape[0]
 
-    # build graph from matrix and use page rank
-    simGraph = nx.from_numpy_array(simMatrix)
-    scores = nx.pagerank(simGraph)
+    if nodeCount == 0:
+        return {}
+
+    outWeight = np.asarray(simMatrix.sum(axis=1)).ravel()
+    invOut = np.divide(1.0, outWeight, out=np.zeros_like(outWeight), where=outWeight != 0)
+    # transition matrix transposed, so each iteration is a single sparse mat-vec
+    transT = (diags(invOut) @ simMatrix).T.tocsr()
+    dangling = outWeight == 0
+
+    if nstart is None:
+        x = np.full(nodeCount, 1.0 / nodeCount)
+    else:
+        # warm start, e.g. from a previous run on the same document
+        x = np.asarray([nstart[i] for i in range(nodeCount)], dtype=float)
+        x = x / x.sum()
+
+    for _ in range(maxIter):
+        xLast = x
+        x = alpha * (transT @ xLast + xLast[dangling].sum() / nodeCount) + (1 - alpha) / nodeCount
+        err = np.abs(x - xLast).sum()
+        if err < nodeCount * tol:
+            return dict(enumerate(x))
+
+    sys.stderr.write(f"ERROR: TextRank failed to converge in {maxIter} iterations.\n")
+    raise Exception("TextRank did not converge")
+
+
+def cosineModel(sentences, langStopWords, topN, topK=None):
+    summary = []
+
+    simMatrix = cosineSimMatrix(sentences, langStopWords, topK)
+
+    # rank sentences with page rank directly over the sparse matrix
+    scores = textRank(simMatrix)
 
     ranked_sentence = sorted(((scores[i], s) for i, s in enumerate(sentences)), reverse=True)
     # sys.stdout.write(f"Indexes of top ranked_sentence order are {ranked_sentence}")
@@ -96,81 +307,39 @@ def cosineModel(sentences, langStopWords, topN):
     return " ".join(summary)
 
 
-def sentenceSim(sentenceOne, sentenceTwo, langStopWords):
-    if langStopWords is None:
-        langStopWords = []
-
-    sentenceOne = [w.lower() for w in sentenceOne]
-    sentenceTwo = [w.lower() for w in sentenceTwo]
-
-    allWords = list(set(sentenceOne + sentenceTwo))
-    vectorOne = [0] * len(allWords)
-    vectorTwo = [0] * len(allWords)
+def splitSentences(lines):
+    # tokenize each line once, then derive the clean form from each punctuated sentence so both stay aligned
+    from nltk.tokenize import sent_tokenize
 
-    for w in sentenceOne:
-        if w in langStopWords:
-            continue
-        vectorOne[allWords.index(w)] += 1
+    sentences = []
+    sentWithPunct = []
 
-    for w in sentenceTwo:
-        if w in langStopWords:
-            continue
-        vectorTwo[allWords.index(w)] += 1
+    for line in lines:
+        if line.strip():
+            for sentence in sent_tokenize(line):
+                sentWithPunct.append(sentence)
+                sentences.append(stripPunct(sentence, keepPeriods=True).lower())
 
-    return 1 - cosine_distance(vectorOne, vectorTwo)
+    return sentences, sentWithPunct
 
 
-def main():
-    parser = ArgumentParser(usage=__doc__)
-    parser.add_argument('input', metavar='File name', help='A text file')
-    parser.add_argument('-n', metavar='Top number of sentences', help='The n amount of sentences you want from the top ranked sentences', type=int, default=1)
-    parser.add_argument('--lang', metavar='language setting', help='Stop word language setting', default=None)
-    parser.add_argument('--model', metavar='model setting', help='Model setting', default="bm25", choices=["cosine", "tfidf", "bm25"])
-    parser.add_argument('--other', metavar='return above average score', help='Returns sentences above average score instead of top n items', default=False, choices=["avg"])
-    args = parser.parse_args()
-
-    fileInput = args.input
-    topN = args.n
-    lang = args.lang
-    model = args.model
-    aboveAverage = args.other
+def summariseSentences(sentences, sentWithPunct, model, topN, langStopWords, aboveAverage=False, topK=None, idfCache=None):
     byLine = False
     summaryNum = topN
 
-    if aboveAverage == "avg":
-        aboveAverage = True
-
-    if lang == "eng":
-        langStopWords = stopwords.words('english')
-    else:
-        langStopWords = None
-
-    with open(fileInput, "r") as textfile:
-        text = textfile.readlines()
-
-        punctRegex = "[();:,\'\"?\/\\!”“—-]"
-        sentences = []
-        sentWithPunct = []
-        
-        for line in text:
-            if line.strip():
-                processedLine = re.sub(punctRegex, "", line).lower()
-                sentences.extend(sent_tokenize(processedLine))
-                sentWithPunct.extend(sent_tokenize(line))
-
     if topN > len(sentences):
         sys.stderr.write("ERROR: The amount of sentences requested is larger than the amount of sentences in the input!\n")
         raise Exception("More sentences requested than in input")
 
     if model == "cosine":
-        out = cosineModel(sentences, langStopWords, topN)
+        out = cosineModel(sentences, langStopWords, topN, topK)
     elif model == "tfidf":
         tokens = [sentence.lower().split() for sentence in sentences]
-        rankedScores, avgScore = tfidfModel(tokens)
+        rankedScores, avgScore = tfidfModel(tokens, idfCache)
         byLine = True
     elif model == "bm25":
         tokens = [sentence.lower().split() for sentence in sentences]
-        rankedScores, avgScore = bm25Summarise(tokens)
+        rankedScores, avgScore = bm25Summarise(tokens, idfCache)
         byLine = True
     else:
         sys.stderr.write("ERROR: Not a valid model choice.\n")
@@ -190,6 +359,167 @@ def main():
         for i in range(topN):
             out = out + sentWithPunct[rankedList[i]] + " "
 
+    return out, summaryNum
+
+
+def getStopWords(lang):
+    if lang == "eng":
+        from nltk.corpus import stopwords
+        return stopwords.words('english')
+
+    return None
+
+
+def readDocuments(batchInput):
+    # yields (docID, text) from a directory of text files or a JSONL stream ("-" for stdin)
+    if os.path.isdir(batchInput):
+        for fileName in sorted(os.listdir(batchInput)):
+            filePath = os.path.join(batchInput, fileName)
+            if os.path.isfile(filePath):
+                with open(filePath, "r") as textfile:
+                    yield fileName, textfile.read()
+    else:
+        stream = sys.stdin if batchInput == "-" else open(batchInput, "r")
+        try:
+            for lineNum, line in enumerate(stream):
+                if line.strip():
+                    doc = json.loads(line)
+                    yield doc.get("id", lineNum), doc["text"]
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def buildIdfCache(corpusInput, cachePrefix):
+    # corpus-wide document frequencies, one "document" per sentence to match per-document scoring
+    from gensim.corpora import Dictionary
+
+    corpusDict = Dictionary()
+    docCount = 0
+
+    for docID, text in readDocuments(corpusInput):
+        sentences, sentWithPunct = splitSentences(text.splitlines())
+        corpusDict.add_documents([sentence.lower().split() for sentence in sentences])
+        docCount += 1
+
+    sentCount = corpusDict.num_docs
+    if sentCount == 0:
+        sys.stderr.write("ERROR: No sentences found in the corpus, nothing to build an IDF cache from.\n")
+        raise Exception("Empty corpus")
+
+    # terms sorted by their UTF-8 bytes, so a term's column is its position and lookups are
+    # a binary search over an array that can be memory mapped, unlike a pickled dictionary
+    terms = sorted((term.encode("utf-8"), termID) for term, termID in corpusDict.token2id.items())
+    docFreqs = np.array([corpusDict.dfs[termID] for term, termID in terms], dtype=float)
+
+    np.save(cachePrefix + ".vocab.npy", np.array([term for term, termID in terms], dtype=f"S{max(len(term) for term, termID in terms)}"))
+    np.save(cachePrefix + ".tfidf.npy", np.log2(sentCount / docFreqs))
+    np.save(cachePrefix + ".bm25.npy", bm25Idf(docFreqs, sentCount))
+
+    with open(cachePrefix + ".meta.json", "w") as metaFile:
+        json.dump({"documents": docCount, "sentences": sentCount, "avgDocLen": corpusDict.num_pos / sentCount}, metaFile)
+
+    sys.stderr.write(f"Built IDF cache from {docCount} documents, {sentCount} sentences, {len(corpusDict)} terms\n")
+
+
+def loadIdfCache(cachePrefix):
+    # vocabulary and weight tables are all memory mapped, so batch workers share the same pages
+    if not os.path.exists(cachePrefix + ".vocab.npy"):
+        sys.stderr.write("ERROR: IDF cache has no vocab.npy, it was built by an older version; rebuild it with --build-idf.\n")
+        raise Exception("Outdated IDF cache")
+
+    with open(cachePrefix + ".meta.json", "r") as metaFile:
+        meta = json.load(metaFile)
+
+    return {
+        "vocab": np.load(cachePrefix + ".vocab.npy", mmap_mode="r"),
+        "tfidf": np.load(cachePrefix + ".tfidf.npy", mmap_mode="r"),
+        "bm25": np.load(cachePrefix + ".bm25.npy", mmap_mode="r"),
+        "avgDocLen": meta["avgDocLen"],
+    }
+
+
+def initWorker(lang, cachePrefix=None):
+    # load stop words and warm up the punkt tokenizer once per worker, not once per document
+    global workerStopWords, workerIdfCache
+    from nltk.tokenize import sent_tokenize
+
+    workerStopWords = getStopWords(lang)
+    workerIdfCache = loadIdfCache(cachePrefix) if cachePrefix else None
+    sent_tokenize("Warm up. The tokenizer.")
+
+
+def summariseDoc(job):
+    docID, text, model, topN, aboveAverage, topK = job
+    sentences, sentWithPunct = splitSentences(text.splitlines())
+
+    try:
+        out, summaryNum = summariseSentences(sentences, sentWithPunct, model, topN, workerStopWords, aboveAverage, topK, workerIdfCache)
+    except Exception as e:
+        return {"id": docID, "error": str(e)}
+
+    return {"id": docID, "summary": out.strip(), "sentences": len(sentWithPunct), "summary_sentences": summaryNum}
+
+
+def batchSummarise(batchInput, model, topN, lang, aboveAverage, topK, workers, cachePrefix=None):
+    jobs = ((docID, text, model, topN, aboveAverage, topK) for docID, text in readDocuments(batchInput))
+    docCount = 0
+    startTime = time.perf_counter()
+
+    with Pool(workers, initializer=initWorker, initargs=(lang, cachePrefix)) as pool:
+        # imap keeps output in input order while workers run ahead
+        for result in pool.imap(summariseDoc, jobs, chunksize=8):
+            sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+            docCount += 1
+
+    elapsed = time.perf_counter() - startTime
+    sys.stderr.write(f"Summarised {docCount} documents in {elapsed:.2f}s ({docCount / elapsed if elapsed else 0:.1f} docs/sec)\n")
+
+
+def main():
+    parser = ArgumentParser(usage=__doc__)
+    parser.add_argument('input', metavar='File name', help='A text file, or with --batch a directory of text files or a JSONL file ("-" for stdin)')
+    parser.add_argument('-n', metavar='Top number of sentences', help='The n amount of sentences you want from the top ranked sentences', type=int, default=1)
+    parser.add_argument('--lang', metavar='language setting', help='Stop word language setting', default=None)
+    parser.add_argument('--model', metavar='model setting', help='Model setting', default="bm25", choices=["cosine", "tfidf", "bm25"])
+    parser.add_argument('--topk', metavar='top k edges', help='Keep only the k most similar neighbours per sentence (cosine model)', type=int, default=None)
+    parser.add_argument('--other', metavar='return above average score', help='Returns sentences above average score instead of top n items', default=False, choices=["avg"])
+    parser.add_argument('--batch', help='Summarise many documents, writing one JSON line per document', action='store_true', default=False)
+    parser.add_argument('--idf-cache', metavar='IDF cache prefix', help='Use corpus-wide IDF weights saved under this path prefix (tfidf, bm25)', default=None)
+    parser.add_argument('--build-idf', help='Build the --idf-cache from input (a directory or JSONL corpus) and exit', action='store_true', default=False)
+    parser.add_argument('--workers', metavar='worker processes', help='Number of worker processes for --batch', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    fileInput = args.input
+    topN = args.n
+    lang = args.lang
+    model = args.model
+    aboveAverage = args.other
+    topK = args.topk
+    cachePrefix = args.idf_cache
+
+    if aboveAverage == "avg":
+        aboveAverage = True
+
+    if args.build_idf:
+        if cachePrefix is None:
+            sys.stderr.write("ERROR: --build-idf needs --idf-cache to know where to save.\n")
+            raise Exception("No IDF cache path given")
+        buildIdfCache(fileInput, cachePrefix)
+        return None
+
+    if args.batch:
+        batchSummarise(fileInput, model, topN, lang, aboveAverage, topK, args.workers, cachePrefix)
+        return None
+
+    langStopWords = getStopWords(lang)
+
+    with open(fileInput, "r") as textfile:
+        sentences, sentWithPunct = splitSentences(textfile.readlines())
+
+    idfCache = loadIdfCache(cachePrefix) if cachePrefix else None
+    out, summaryNum = summariseSentences(sentences, sentWithPunct, model, topN, langStopWords, aboveAverage, topK, idfCache)
+
     sys.stdout.write(f"Summary:\n{out}\n")
     sys.stdout.write(f"\nOriginal number of sentences = {len(sentWithPunct)}\nNumber of summary sentences = {summaryNum}\nSummary size = {round((summaryNum / len(sentWithPunct)) * 100)}%\n")
 
@@ -0,0 +1,60 @@
+import io
+
+from morphAnalyser import MorphLexicon, AnalysisCache, compareWords, analyseWord
+
+LEXICON = {
+    "kat": [["CAT", [None]]],
+    "dog": [["DOG", [None]]],
+    "-s": [["PL", [None]]],
+    "re-": [["AGAIN", [None]]],
+}
+
+
+def diffs(pairs):
+    return compareWords(((w1, w2, 1) for w1, w2 in pairs), MorphLexicon(LEXICON), topDiffs=10, out=io.StringIO())
+
+
+def test_single_affix_differences():
+    assert diffs([("kat", "kats"), ("dog", "dogs")]) == {((), ("PL",)): 2}
+
+
+def test_lexicon_stem_against_prefixed_word():
+    assert diffs([("rekat", "kat")]) == {(("AGAIN",), ()): 1}
+
+
+def test_stems_are_left_out_of_signatures():
+    assert diffs([("kat", "dog"), ("kats", "dogs")]) == {}
+
+
+def test_saved_lexicon_loads_through_library(tmp_path):
+    lexicon = MorphLexicon(LEXICON)
+    path = str(tmp_path / "lexicon.pkl")
+    lexicon.save(path)
+
+    loaded = MorphLexicon.load(path)
+    assert loaded.fingerprint == lexicon.fingerprint
+    assert loaded.glosses == lexicon.glosses
+    assert list(loaded.automaton.findAll("rekats")) == list(lexicon.automaton.findAll("rekats"))
+    assert analyseWord("rekats", loaded).toDict() == analyseWord("rekats", lexicon).toDict()
+
+
+def test_saved_cache_loads_through_library(tmp_path):
+    lexicon = MorphLexicon(LEXICON)
+    path = str(tmp_path / "cache.pkl")
+    cache = AnalysisCache(100, lexicon.fingerprint)
+    for word in ("rekats", "kat", "dogs"):
+        analyseWord(word, lexicon, cache=cache)
+    cache.save(path)
+
+    loaded = AnalysisCache.load(path, lexicon.fingerprint)
+    assert loaded.stats()["words"]["size"] == 3
+    for word in ("rekats", "kat", "dogs"):
+        assert analyseWord(word, lexicon, cache=loaded).toDict() == analyseWord(word, lexicon).toDict()
+    assert loaded.stats()["words"]["misses"] == 0
+
+
+def test_unreadable_cache_starts_fresh(tmp_path):
+    path = tmp_path / "cache.pkl"
+    path.write_bytes(b"not a pickle")
+
+    assert AnalysisCache.load(str(path), "lexicon").stats()["words"]["size"] == 0
@@ -4,12 +4,11 @@ Get ngrams from file
 """
 
 import sys
-import re
 import random
 
 from argparse import ArgumentParser
-from nltk.util import ngrams
-from collections import Counter, defaultdict
+from textProcessing import calcProbs, loadTokens, ngrams
+from collections import Counter
 
 
 def generateText(probs, genText, ngramType, n, seed):
@@ -49,48 +48,6 @@ def generateText(probs, genText, ngramType, n, seed):
     return "Generated Sentence: " + " ".join(text)
 
 
-def calcProbs(ngramFreqs, n):
-    probs = defaultdict(lambda: defaultdict(lambda: 0))
-
-    if n == 2:
-        for bigram, count in ngramFreqs.items():
-            probs[bigram[0]][bigram[1]] += count
-
-        for w1 in probs:
-            total = float(sum(probs[w1].values()))
-            for w2 in probs[w1]:
-                probs[w1][w2] /= total
-    elif n == 3:
-        for trigram, count in ngramFreqs.items():
-            probs[(trigram[0], trigram[1])][trigram[2]] += count
-
-        for w1w2 in probs:
-            total = float(sum(probs[w1w2].values()))
-            for w3 in probs[w1w2]:
-                probs[w1w2][w3] /= total
-    elif n == 4:
-        for fourgram, count in ngramFreqs.items():
-            probs[(fourgram[0], fourgram[1], fourgram[2])][fourgram[3]] += count
-
-        for w1w2w3 in probs:
-            total = float(sum(probs[w1w2w3].values()))
-            for w4 in probs[w1w2w3]:
-                probs[w1w2w3][w4] /= total
-    elif n == 5:
-        for fivegram, count in ngramFreqs.items():
-            probs[(fivegram[0], fivegram[1], fivegram[2], fivegram[3])][fivegram[4]] += count
-
-        for w1w2w3w4 in probs:
-            total = float(sum(probs[w1w2w3w4].values()))
-            for w5 in probs[w1w2w3w4]:
-                probs[w1w2w3w4][w5] /= total
-    else:
-        sys.stderr.write("ERROR: n not valid")
-        raise Exception("n not valid")
-
-    return probs
-
-
 def main():
 
     parser = ArgumentParser(usage=__doc__)
@@ -101,6 +58,7 @@ def main():
     parser.add_argument('--predict', metavar='predict', help='Input the string to predict the next word of', default=False)
     parser.add_argument('--generate', metavar='generate', help='Generate a sentence of length n based on input', default=0, type=int)
     parser.add_argument('--seed', metavar='seed', help='Text seed for generating text', default=False)
+    parser.add_argument('--token-cache', metavar='token cache', help='Directory to cache the tokenized input in, reused on later runs', default=None)
     args = parser.parse_args()
 
     fileInput = args.input
@@ -110,6 +68,7 @@ def main():
     getProbs = bool(args.p)
     genText = args.generate
     seed = args.seed
+    tokenCache = args.token_cache
     nGramLookUp = {2: "bigram", 3: "trigram", 4: "4-gram", 5: "5-gram"}
 
     if predict is not False:
@@ -128,13 +87,7 @@ def main():
             sys.stdout.write(f"WARNING: Calculating {nGramLookUp[n]}s but given string to predict is {predictLen - (n - 1)} word(s) longer than expected. Ignoring.\n")
             predict = False
 
-    with open(fileInput, "r") as textfile:
-        text = textfile.read()
-
-    punctRegex = "[();:.,\'\"?\/\\!”“—-]"
-    textNoPunct = re.sub(punctRegex, "", text)
-
-    tokens = textNoPunct.lower().split()
+    tokens = loadTokens(fileInput, tokenCache)
     ngramGen = ngrams(tokens, n)
     ngramFreqs = Counter(ngramGen)
     topNgrams = ngramFreqs.most_common(c)
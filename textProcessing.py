@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+'''
+-- stripPunct/tokenize - single pass punctuation removal with str.translate, shared by ngrams, textGen and summariseText
+-- ngrams - n-gram tuples over a token list, the same as nltk.util.ngrams without padding
+-- calcProbs - conditional next-word probabilities from n-gram counts
+-- loadTokens - tokenizes a text file, optionally caching it on disk as a vocabulary plus an array of token ids
+'''
+
+import os
+import sys
+import json
+import hashlib
+
+from collections import defaultdict
+
+# the punctuation the scripts have always removed; sentence-level processing keeps full stops
+PUNCT_CHARS = "();:.,'\"?/!”“—-"
+WORD_TABLE = str.maketrans("", "", PUNCT_CHARS)
+SENTENCE_TABLE = str.maketrans("", "", PUNCT_CHARS.replace(".", ""))
+
+
+def stripPunct(text, keepPeriods=False):
+    return text.translate(SENTENCE_TABLE if keepPeriods else WORD_TABLE)
+
+
+def tokenize(text):
+    # single pass over the text: translate out punctuation, lowercase, split on whitespace
+    return text.translate(WORD_TABLE).lower().split()
+
+
+def ngrams(tokens, n):
+    # avoids importing nltk, which takes most of a second, just to count
+    return zip(*(tokens[i:] for i in range(n)))
+
+
+def calcProbs(ngramFreqs, n):
+    # P(next word | previous n - 1 words); bigram contexts are the bare word, longer ones tuples
+    if n not in (2, 3, 4, 5):
+        sys.stderr.write("ERROR: n not valid")
+        raise Exception("n not valid")
+
+    probs = defaultdict(lambda: defaultdict(lambda: 0))
+
+    for gram, count in ngramFreqs.items():
+        context = gram[0] if n == 2 else gram[:-1]
+        probs[context][gram[-1]] += count
+
+    for context in probs:
+        total = float(sum(probs[context].values()))
+        for word in probs[context]:
+            probs[context][word] /= total
+
+    return probs
+
+
+def cacheKey(path):
+    # changes whenever the file does
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}:{PUNCT_CHARS}"
+
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def loadTokens(path, cacheDir=None):
+    # tokens of a text file; with cacheDir the corpus is stored once as a vocabulary
+    # plus an array of token ids, and later runs memory map the ids instead of re-tokenizing
+    if cacheDir is None:
+        with open(path, "r") as textfile:
+            return tokenize(textfile.read())
+
+    import numpy as np
+
+    key = cacheKey(path)
+    vocabPath = os.path.join(cacheDir, key + ".vocab.json")
+    idsPath = os.path.join(cacheDir, key + ".ids.npy")
+
+    if os.path.exists(vocabPath) and os.path.exists(idsPath):
+        with open(vocabPath, "r") as vocabFile:
+            vocab = json.load(vocabFile)
+        ids = np.load(idsPath, mmap_mode="r")
+        return [vocab[i] for i in ids.tolist()]
+
+    with open(path, "r") as textfile:
+        tokens = tokenize(textfile.read())
+
+    vocabIDs = {}
+    ids = np.fromiter((vocabIDs.setdefault(token, len(vocabIDs)) for token in tokens), dtype=np.int32, count=len(tokens))
+
+    os.makedirs(cacheDir, exist_ok=True)
+    np.save(idsPath, ids)
+    with open(vocabPath, "w") as vocabFile:
+        json.dump(list(vocabIDs), vocabFile, ensure_ascii=False)
+
+    return tokens